@@ -1,16 +1,37 @@
-import json
+import os
+
 import streamlit as st
 
 from core.ai_processing import (
-    categorize_and_prioritize,
-    classify_cognitive_load,
-    extract_tasks,
-    transcribe_audio,
+    LONG_AUDIO_THRESHOLD_SECONDS,
+    transcribe_note,
     GeminiClientError,
     GeminiQuotaError,
+    cache_stats,
+    limiter_state,
+)
+from core.audio import mime_type_for
+from core.incremental import extract_incremental, iter_extract_incremental
+from core.jobs import get_job_queue
+from core.local_classifier import classifier_for_user
+from core.metrics import registry, start_metrics_server
+from core.scheduling import create_focus_blocks, schedule_task, schedule_tasks
+from core.storage import (
+    init_db,
+    save_plan,
+    list_plan_summaries,
+    load_plan,
+    search_plans,
+    create_user,
+    authenticate_user,
+    get_job,
+    list_jobs,
+    task_stats,
 )
-from core.scheduling import create_focus_blocks, schedule_task
-from core.storage import init_db, save_plan, list_plans, create_user, authenticate_user
+from core.view_model import MATRIX_QUADRANTS, get_plan_view
+
+HISTORY_PAGE_SIZE = 5
+METRICS_PORT = os.getenv("METRICS_PORT")
 
 st.set_page_config(page_title="AI Voice Task Planner", layout="wide")
 
@@ -89,6 +110,16 @@ html, body {
 """, unsafe_allow_html=True)
 
 init_db()
+# Start the worker pool now so jobs queued before a restart resume without waiting for a click.
+get_job_queue()
+
+def metric_gauges():
+    gauges = {f"gemini_limiter_{k}": v for k, v in limiter_state().items() if isinstance(v, (int, float))}
+    gauges.update({f"gemini_cache_{k}": v for k, v in cache_stats().items() if isinstance(v, (int, float))})
+    return gauges
+
+if METRICS_PORT:
+    start_metrics_server(int(METRICS_PORT), gauges=metric_gauges)
 
 def get_demo_plan():
     demo_transcript = (
@@ -116,6 +147,16 @@ def get_demo_plan():
     blocks = create_focus_blocks(tasks)
     return demo_transcript, tasks, scheduled, blocks
 
+def stream_tasks(transcript, placeholder, classifier=None):
+    """Render tasks into `placeholder` as they stream in; returns the full list."""
+    tasks = []
+    for task in iter_extract_incremental(transcript, classifier=classifier):
+        tasks.append(task)
+        placeholder.markdown(
+            "\n".join(f"- {t['task']} · *{t['category']}* · {t['priority']}" for t in tasks)
+        )
+    return tasks
+
 if "user" not in st.session_state:
     st.session_state.user = None
 
@@ -160,6 +201,36 @@ if st.session_state.user is None:
     st.stop()
 
 st.sidebar.markdown(f"**Logged in as:** {st.session_state.user['username']}")
+use_fast_path = st.sidebar.toggle(
+    "Label familiar tasks locally",
+    value=True,
+    help="Reuse the labels you saved for familiar tasks instead of Gemini's.",
+)
+if use_fast_path:
+    fast_path = classifier_for_user(st.session_state.user["id"]).snapshot()
+    st.sidebar.caption(
+        f"Learned from {fast_path['trained_on']} saved tasks · "
+        f"{fast_path['fast_labelled']}/{fast_path['tasks']} labelled locally · "
+        f"{fast_path['llm_calls_avoided']} Gemini calls avoided"
+    )
+run_in_background = st.sidebar.toggle(
+    "Run in background",
+    value=False,
+    help="Queue transcription and extraction so you can keep adding notes while they run.",
+)
+if st.sidebar.toggle("Debug metrics", value=False):
+    with st.sidebar.expander("⏱️ Stage timings", expanded=True):
+        stages = registry.stage_summary()
+        if stages:
+            st.dataframe(
+                [{"stage": name, "calls": count, "avg ms": round(avg, 1), "max ms": round(peak, 1)} for name, count, avg, peak in stages],
+                hide_index=True,
+            )
+        else:
+            st.caption("No timings recorded yet.")
+        st.json({"limiter": limiter_state(), "cache": cache_stats()}, expanded=False)
+        for recorded_at, seconds, statement in reversed(registry.recent_slow_queries()):
+            st.caption(f"🐢 {seconds * 1000:.0f} ms · {statement}")
 
 if "transcript" not in st.session_state:
     st.session_state.transcript = ""
@@ -169,6 +240,11 @@ if "scheduled_tasks" not in st.session_state:
     st.session_state.scheduled_tasks = {}
 if "blocks" not in st.session_state:
     st.session_state.blocks = []
+if "tracked_jobs" not in st.session_state:
+    # After a reload, keep polling for jobs this user queued earlier.
+    st.session_state.tracked_jobs = {
+        job["id"]: job["kind"] for job in list_jobs(st.session_state.user["id"], limit=50, statuses=("queued", "running"))
+    }
 
 with st.container():
     st.markdown("<div class='app-card'>", unsafe_allow_html=True)
@@ -198,23 +274,44 @@ with st.container():
             type=["wav", "mp3", "m4a"],
             label_visibility="collapsed",
         )
-        st.caption("Short notes (2–3 minutes) work best. Supported: WAV, MP3, M4A.")
+        st.caption(
+            f"Supported: WAV, MP3, M4A. WAV notes longer than {LONG_AUDIO_THRESHOLD_SECONDS // 60} minutes are transcribed in parallel segments; "
+            "keep MP3/M4A notes short (2–3 minutes)."
+        )
         if audio_file:
             st.audio(audio_file)
+            savings = st.session_state.get("upload_savings")
+            if savings and savings["bytes_saved"] > 0:
+                st.caption(
+                    f"Upload shrunk from {savings['original_bytes'] / 1024:.0f} KB to "
+                    f"{savings['processed_bytes'] / 1024:.0f} KB (mono, {savings['sample_rate'] // 1000} kHz, silence trimmed)."
+                )
             if st.button("🎯 Transcribe audio"):
-                with st.spinner("Transcribing..."):
-                    mime_map = {"wav": "audio/wav", "mp3": "audio/mp3", "m4a": "audio/mp4"}
-                    mime_type = mime_map.get(audio_file.name.split(".")[-1], "audio/wav")
-                    audio_bytes = audio_file.read()
-                    try:
-                        st.session_state.transcript = transcribe_audio(audio_bytes, mime_type)
-                        st.rerun()
-                    except GeminiQuotaError as exc:
-                        st.error(str(exc))
-                    except GeminiClientError as exc:
-                        st.error(f"Transcription failed: {exc}")
-                    except Exception as exc:
-                        st.error(f"Unexpected transcription error: {exc}")
+                mime_type = mime_type_for(audio_file.name)
+                audio_bytes = audio_file.getvalue()
+                if run_in_background:
+                    job_id = get_job_queue().submit_transcribe(
+                        st.session_state.user["id"], audio_bytes, mime_type, label=audio_file.name
+                    )
+                    st.session_state.tracked_jobs[job_id] = "transcribe"
+                    st.toast(f"Queued transcription of {audio_file.name}.")
+                else:
+                    with st.spinner("Transcribing..."):
+                        try:
+                            preview = st.empty()
+                            st.session_state.transcript = transcribe_note(
+                                audio_bytes,
+                                mime_type,
+                                on_partial=preview.markdown,
+                                on_preprocess=lambda stats: st.session_state.update(upload_savings=stats),
+                            )
+                            st.rerun()
+                        except GeminiQuotaError as exc:
+                            st.error(str(exc))
+                        except GeminiClientError as exc:
+                            st.error(f"Transcription failed: {exc}")
+                        except Exception as exc:
+                            st.error(f"Unexpected transcription error: {exc}")
     with right_col:
         st.markdown("#### 📝 2. Edit text & extract tasks")
         st.caption("Paste your notes here, or use the left panel to transcribe an audio note.")
@@ -230,52 +327,121 @@ with st.container():
             if not st.session_state.transcript.strip():
                 st.warning("Please add some text first, or transcribe audio.")
             else:
-                with st.spinner("Extracting tasks..."):
-                    try:
-                        raw_tasks = extract_tasks(st.session_state.transcript)
-                        if not raw_tasks:
-                            st.warning("No actionable tasks detected. Try adding more concrete actions or clearer phrasing.")
-                        else:
-                            categorized = categorize_and_prioritize(raw_tasks)
-                            classified = classify_cognitive_load(categorized)
-                            for task in classified:
-                                task["schedule"] = schedule_task(task["priority"])
-                                task["done"] = False
-                            st.session_state.tasks = classified
-                            scheduled = {"Today": [], "Tomorrow": [], "Later": []}
-                            for task in classified:
-                                scheduled[task["schedule"]].append(task)
-                            st.session_state.scheduled_tasks = scheduled
-                            st.rerun()
-                    except GeminiQuotaError as exc:
-                        st.error(str(exc))
-                    except GeminiClientError as exc:
-                        st.error(f"Task extraction failed: {exc}")
-                    except Exception as exc:
-                        st.error(f"Unexpected task extraction error: {exc}")
+                if run_in_background:
+                    job_id = get_job_queue().submit_extract(
+                        st.session_state.user["id"],
+                        st.session_state.transcript,
+                        st.session_state.tasks,
+                        fast_path=use_fast_path,
+                        label=st.session_state.transcript.strip().split("\n")[0][:40],
+                    )
+                    st.session_state.tracked_jobs[job_id] = "extract"
+                    st.toast("Queued task extraction.")
+                else:
+                    with st.spinner("Extracting tasks..."):
+                        try:
+                            classifier = classifier_for_user(st.session_state.user["id"]) if use_fast_path else None
+                            if st.session_state.tasks:
+                                # Edits re-extract only the changed segments.
+                                classified, _ = extract_incremental(
+                                    st.session_state.transcript, st.session_state.tasks, classifier=classifier
+                                )
+                            else:
+                                classified = stream_tasks(st.session_state.transcript, st.empty(), classifier)
+                            if not classified:
+                                st.warning("No actionable tasks detected. Try adding more concrete actions or clearer phrasing.")
+                            else:
+                                st.session_state.scheduled_tasks = schedule_tasks(classified)
+                                st.session_state.tasks = classified
+                                st.rerun()
+                        except GeminiQuotaError as exc:
+                            st.error(str(exc))
+                        except GeminiClientError as exc:
+                            st.error(f"Task extraction failed: {exc}")
+                        except Exception as exc:
+                            st.error(f"Unexpected task extraction error: {exc}")
     st.markdown("</div>", unsafe_allow_html=True)
 
+JOB_ICONS = {"queued": "⏳", "running": "⚙️", "done": "✅", "failed": "⚠️"}
+
+
+def apply_job_result(job):
+    if job["kind"] == "transcribe":
+        st.session_state.transcript = job["result"]["transcript"]
+    else:
+        tasks = job["result"]["tasks"]
+        st.session_state.scheduled_tasks = schedule_tasks(tasks)
+        st.session_state.tasks = tasks
+
+
+def render_jobs():
+    user_id = st.session_state.user["id"]
+    jobs = list_jobs(user_id, limit=8)
+    shown = {job["id"]: job for job in jobs}
+    finished = False
+    for job_id in list(st.session_state.tracked_jobs):
+        # Tracked jobs can fall off the recent list; look those up directly.
+        job = shown.get(job_id) or get_job(job_id, user_id)
+        if job is not None and job["status"] not in ("done", "failed"):
+            continue
+        del st.session_state.tracked_jobs[job_id]
+        finished = True
+        # A finished transcription only fills an empty editor; otherwise use its button.
+        if job is not None and job["status"] == "done" and (
+            job["kind"] == "extract" or not st.session_state.transcript.strip()
+        ):
+            apply_job_result(job)
+    if finished:
+        # A full rerun applies results and re-registers the fragment, which stops polling once nothing is tracked.
+        st.rerun()
+    if not jobs:
+        return
+    st.markdown("#### 🗂️ Background jobs")
+    for job in jobs:
+        what = "Transcribe" if job["kind"] == "transcribe" else "Extract"
+        info_col, action_col = st.columns([4, 1])
+        with info_col:
+            st.markdown(f"{JOB_ICONS.get(job['status'], '')} **{what}** · {job['label'] or 'untitled'} · {job['status']}")
+            if job["error"]:
+                st.caption(job["error"])
+        with action_col:
+            if job["status"] == "done" and st.button("Use", key=f"job_{job['id']}"):
+                apply_job_result(job)
+                st.rerun()
+
+
+# Poll only while this session is waiting on a job.
+st.fragment(run_every=2 if st.session_state.tracked_jobs else None)(render_jobs)()
+
+@st.fragment
+def render_todo_list():
+    # Runs as a fragment so ticking a box reruns only the checklist, not the whole plan.
+    st.markdown("#### ✅ To-do list")
+    for idx, task in enumerate(st.session_state.tasks):
+        task["done"] = st.checkbox(
+            task["task"],
+            key=f"todo_{idx}",
+            value=task.get("done", False),
+        )
+        st.caption(f"🏷️ {task.get('category', 'Uncategorized')} · 🧠 {task.get('type', 'Unclassified')}")
+
+
 if st.session_state.tasks:
+    plan_view = get_plan_view(st.session_state.tasks)
     with st.container():
         st.markdown("<div class='app-card'>", unsafe_allow_html=True)
         st.markdown("<h3 class='accent'>📋 3. Your plan for this note</h3>", unsafe_allow_html=True)
         row1_col1, row1_col2 = st.columns(2)
         with row1_col1:
-            st.markdown("#### ✅ To-do list")
-            for idx, task in enumerate(st.session_state.tasks):
-                task["done"] = st.checkbox(
-                    task["task"],
-                    key=f"todo_{idx}",
-                    value=task.get("done", False),
-                )
-                st.caption(f"🏷️ {task.get('category', 'Uncategorized')} · 🧠 {task.get('type', 'Unclassified')}")
+            render_todo_list()
         with row1_col2:
             st.markdown("#### 📅 When to do them")
+            schedule_view = plan_view.schedule_tasks(st.session_state.tasks)
             today_col, tomorrow_col, later_col = st.columns(3)
             for label, column in zip(["Today", "Tomorrow", "Later"], [today_col, tomorrow_col, later_col]):
                 with column:
                     st.markdown(f"**{label}**")
-                    tasks_for_day = st.session_state.scheduled_tasks.get(label, [])
+                    tasks_for_day = schedule_view.get(label, [])
                     if tasks_for_day:
                         for task in tasks_for_day:
                             st.markdown(f"- {task['task']}")
@@ -284,55 +450,53 @@ if st.session_state.tasks:
         row2_col1, row2_col2 = st.columns(2)
         with row2_col1:
             st.markdown("#### 🧭 Priority matrix")
-            matrix = {
-                "Urgent & Important": [],
-                "Urgent & Not Important": [],
-                "Important & Not Urgent": [],
-                "Not Urgent & Not Important": [],
-            }
-            for task in st.session_state.tasks:
-                if task.get("priority") in matrix:
-                    matrix[task["priority"]].append(task)
+            matrix = plan_view.matrix_tasks(st.session_state.tasks)
             top_left, top_right = st.columns(2)
-            with top_left:
-                st.markdown("**Urgent & Important**")
-                if matrix["Urgent & Important"]:
-                    for task in matrix["Urgent & Important"]:
-                        st.markdown(f"- {task['task']} ({task.get('category', 'Uncategorized')} • {task.get('type', 'Unclassified')})")
-                else:
-                    st.caption("No tasks yet.")
-            with top_right:
-                st.markdown("**Urgent & Not Important**")
-                if matrix["Urgent & Not Important"]:
-                    for task in matrix["Urgent & Not Important"]:
-                        st.markdown(f"- {task['task']} ({task.get('category', 'Uncategorized')} • {task.get('type', 'Unclassified')})")
-                else:
-                    st.caption("No tasks yet.")
             bottom_left, bottom_right = st.columns(2)
-            with bottom_left:
-                st.markdown("**Important & Not Urgent**")
-                if matrix["Important & Not Urgent"]:
-                    for task in matrix["Important & Not Urgent"]:
-                        st.markdown(f"- {task['task']} ({task.get('category', 'Uncategorized')} • {task.get('type', 'Unclassified')})")
-                else:
-                    st.caption("No tasks yet.")
-            with bottom_right:
-                st.markdown("**Not Urgent & Not Important**")
-                if matrix["Not Urgent & Not Important"]:
-                    for task in matrix["Not Urgent & Not Important"]:
-                        st.markdown(f"- {task['task']} ({task.get('category', 'Uncategorized')} • {task.get('type', 'Unclassified')})")
-                else:
-                    st.caption("No tasks yet.")
+            for quadrant, column in zip(MATRIX_QUADRANTS, [top_left, top_right, bottom_left, bottom_right]):
+                with column:
+                    st.markdown(f"**{quadrant}**")
+                    if matrix[quadrant]:
+                        for task in matrix[quadrant]:
+                            st.markdown(f"- {task['task']} ({task.get('category', 'Uncategorized')} • {task.get('type', 'Unclassified')})")
+                    else:
+                        st.caption("No tasks yet.")
         with row2_col2:
             st.markdown("#### 🎯 Focus blocks")
-            blocks_view = create_focus_blocks(st.session_state.tasks)
-            for block in blocks_view:
+            for block in plan_view.focus_blocks(st.session_state.tasks):
                 st.markdown(f"**{block['type']}**")
                 for task in block["tasks"]:
                     st.markdown(f"- {task['task']}")
                 st.markdown("")
+        with st.expander("🗓️ Calendar"):
+            calendar_plan = plan_view.calendar(st.session_state.tasks)
+            current_day = None
+            for slot in calendar_plan["slots"]:
+                if slot["start"].date() != current_day:
+                    current_day = slot["start"].date()
+                    st.markdown(f"**{current_day:%A %d %b}**")
+                names = ", ".join(task["task"] for task in slot["tasks"])
+                st.markdown(f"- {slot['start']:%H:%M}–{slot['end']:%H:%M} · {slot['type']}: {names}")
+            if calendar_plan["unscheduled"]:
+                st.caption(f"{len(calendar_plan['unscheduled'])} blocks did not fit in the next few weeks.")
         st.markdown("</div>", unsafe_allow_html=True)
 
+def open_saved_plan(plan_id):
+    try:
+        loaded = load_plan(plan_id, st.session_state.user["id"])
+    except ValueError:
+        st.error("This saved plan could not be loaded; it looks corrupted. Your current plan is unchanged.")
+        return
+    if loaded is None:
+        st.error("This saved plan no longer exists.")
+        return
+    st.session_state.transcript = loaded["transcript"]
+    st.session_state.tasks = loaded["tasks"]
+    st.session_state.scheduled_tasks = loaded["schedule"]
+    st.session_state.blocks = loaded["blocks"]
+    st.rerun()
+
+
 with st.container():
     st.markdown("<div class='app-card'>", unsafe_allow_html=True)
     st.markdown("<h3 class='accent'>🕒 4. Saved plans & history</h3>", unsafe_allow_html=True)
@@ -342,7 +506,7 @@ with st.container():
         if not st.session_state.tasks:
             st.warning("Nothing to save yet. Generate tasks and a plan first.")
         else:
-            blocks_to_save = create_focus_blocks(st.session_state.tasks)
+            blocks_to_save = get_plan_view(st.session_state.tasks).focus_blocks(st.session_state.tasks)
             plan = save_plan(
                 st.session_state.user["id"],
                 plan_title,
@@ -353,30 +517,68 @@ with st.container():
                 blocks_to_save,
             )
             st.success(f'Saved plan as "{plan.title}".')
+    st.markdown("#### Search plans")
+    search_query = st.text_input("Search saved plans", placeholder="e.g. invoice, dentist, quarterly report", key="plan_search")
+    if search_query.strip():
+        results = search_plans(st.session_state.user["id"], search_query)
+        if not results:
+            st.caption("No plans match that search.")
+        for p in results:
+            if st.button(
+                f"{p['title']} – {p['created_at'].strftime('%Y-%m-%d %H:%M')}",
+                key=f"search_{p['id']}",
+            ):
+                open_saved_plan(p["id"])
+            if p["snippet"]:
+                st.caption(p["snippet"])
     st.markdown("#### Recent plans")
-    plans = list_plans(st.session_state.user["id"], limit=5)
+    if "history_cursors" not in st.session_state:
+        st.session_state.history_cursors = []
+    cursor = st.session_state.history_cursors[-1] if st.session_state.history_cursors else None
+    plans = list_plan_summaries(st.session_state.user["id"], limit=HISTORY_PAGE_SIZE, before=cursor)
     if not plans:
-        st.caption("No saved plans yet.")
+        st.caption("No saved plans yet." if cursor is None else "No older plans.")
     else:
         for p in plans:
             if st.button(
-                f"{p.title} – {p.created_at.strftime('%Y-%m-%d %H:%M')}",
-                key=f"plan_{p.id}",
+                f"{p['title']} – {p['created_at'].strftime('%Y-%m-%d %H:%M')}",
+                key=f"plan_{p['id']}",
             ):
-                try:
-                    tasks = json.loads(p.tasks_json)
-                    prioritized = json.loads(p.prioritized_json)
-                    schedule = json.loads(p.schedule_json)
-                    loaded_blocks = json.loads(p.blocks_json)
-                except Exception:
-                    st.error("This saved plan could not be loaded; it looks corrupted. Your current plan is unchanged.")
-                else:
-                    if not isinstance(tasks, list) or not isinstance(schedule, dict) or not isinstance(loaded_blocks, list):
-                        st.error("This saved plan could not be loaded; it looks corrupted. Your current plan is unchanged.")
-                    else:
-                        st.session_state.transcript = p.transcript
-                        st.session_state.tasks = tasks
-                        st.session_state.scheduled_tasks = schedule
-                        st.session_state.blocks = loaded_blocks
-                        st.rerun()
+                open_saved_plan(p["id"])
+    newer_col, older_col = st.columns(2)
+    with newer_col:
+        if st.session_state.history_cursors and st.button("← Newer plans", key="history_newer"):
+            st.session_state.history_cursors.pop()
+            st.rerun()
+    with older_col:
+        if len(plans) == HISTORY_PAGE_SIZE and st.button("Older plans →", key="history_older"):
+            last = plans[-1]
+            st.session_state.history_cursors.append((last["created_at"], last["id"]))
+            st.rerun()
+    st.markdown("</div>", unsafe_allow_html=True)
+
+with st.container():
+    st.markdown("<div class='app-card'>", unsafe_allow_html=True)
+    with st.expander("📊 Insights"):
+        granularity = st.radio("Group by", ["week", "month"], horizontal=True, key="insights_granularity")
+        stats = task_stats(st.session_state.user["id"], granularity=granularity)
+        if not stats["total"]:
+            st.caption("Save a plan to start building your insights.")
+        else:
+            deep = stats["by_type"].get("Deep Task", 0)
+            micro = stats["by_type"].get("Micro Task", 0)
+            total_col, done_col, mix_col = st.columns(3)
+            total_col.metric("Tasks planned", stats["total"])
+            done_col.metric("Completion rate", f"{stats['completion_rate']:.0%}")
+            mix_col.metric("Deep vs micro", f"{deep} / {micro}")
+            categories = sorted(stats["by_category"])
+            st.bar_chart(
+                {
+                    granularity: [period.isoformat() for period, _ in stats["timeline"]],
+                    **{c: [counts.get(c, 0) for _, counts in stats["timeline"]] for c in categories},
+                },
+                x=granularity,
+                y=categories,
+            )
+            st.bar_chart({"priority": list(stats["by_priority"]), "tasks": list(stats["by_priority"].values())}, x="priority", y="tasks")
     st.markdown("</div>", unsafe_allow_html=True)
@@ -0,0 +1,50 @@
+"""Micro-benchmark: per-call client construction vs. the memoized registry.
+
+Run with `python -m benchmarks.client_registry`. No network calls are made;
+building a GenerativeModel is purely local, so a dummy key is enough.
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+import google.generativeai as genai
+
+from core import gemini_client
+
+
+def _legacy_get_client():
+    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+    return genai.GenerativeModel(gemini_client.DEFAULT_MODEL)
+
+
+def _measure(fn, iterations):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    return elapsed, peak, blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-key")
+    gemini_client.clear_clients()
+    gemini_client.get_client()
+
+    for label, fn in [("per-call get_client", _legacy_get_client), ("registry get_client", gemini_client.get_client)]:
+        elapsed, peak, blocks = _measure(fn, args.iterations)
+        print(
+            f"{label:<22} {elapsed / args.iterations * 1e6:9.1f} us/call  "
+            f"peak {peak / 1024:8.1f} KiB  live blocks {blocks}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Per-stage latency and allocation benchmark for the planning pipeline.
+
+Runs every stage against the offline fake Gemini backend (no API key, no
+network) on synthetic transcripts of 10 to 10,000 tasks and reports p50/p95
+wall time plus peak traced allocations. Use `--json` to save results and
+compare them across commits.
+
+    python -m benchmarks.pipeline --sizes 10 100 1000 --repeat 5 --latency-ms 0
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from core import ai_processing
+from core.cache import response_cache
+from core.fake_gemini import FakeGenerativeModel, respond
+from core.gemini_client import set_model_override
+from core.rate_limit import gemini_limiter
+from core.scheduling import create_focus_blocks
+
+VERBS = ["Email", "Call", "Buy", "Write", "Review", "Book", "Pay", "Plan", "Draft", "Clean"]
+OBJECTS = ["the landlord", "milk", "quarterly report", "dentist", "rent", "slides", "the team", "invoice"]
+
+
+def synthetic_transcript(task_count):
+    sentences = []
+    for i in range(task_count):
+        sentences.append(f"{VERBS[i % len(VERBS)]} {OBJECTS[(i * 7) % len(OBJECTS)]} number {i}.")
+    return " ".join(sentences)
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(fn, repeat):
+    """Time `fn` `repeat` times, then once more under tracemalloc for peak KiB."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return timings, peak / 1024
+
+
+def stages_for(size):
+    transcript = synthetic_transcript(size)
+    tasks = ai_processing.extract_tasks(transcript)
+    categorized = ai_processing.categorize_and_prioritize(tasks)
+    classified = ai_processing.classify_cognitive_load([dict(t) for t in categorized])
+    task_list = "\n".join(f"{i + 1}. {t}" for i, t in enumerate(tasks))
+    categorized_text = respond(f"For each task, assign category\n\nTasks:\n{task_list}")
+    types_text = respond(f"Classify each task\n\nTasks:\n{task_list}")
+    return [
+        ("extract_tasks", lambda: ai_processing.extract_tasks(transcript)),
+        ("categorize_and_prioritize", lambda: ai_processing.categorize_and_prioritize(tasks)),
+        ("classify_cognitive_load", lambda: ai_processing.classify_cognitive_load([{"task": t["task"]} for t in categorized])),
+        ("extract_tasks_fused", lambda: ai_processing.extract_tasks_fused(transcript)),
+        ("parse_categorized", lambda: ai_processing.parse_categorized(categorized_text, tasks)),
+        ("parse_cognitive_load", lambda: ai_processing.parse_cognitive_load(types_text, [{"task": t} for t in tasks])),
+        ("create_focus_blocks", lambda: create_focus_blocks(classified)),
+    ]
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat, latency_ms, only=None):
+    response_cache.enabled = False
+    gemini_limiter.configure(requests_per_minute=10**9, max_concurrency=64)
+    set_model_override(FakeGenerativeModel(latency=latency_ms / 1000.0))
+    results = []
+    for size in sizes:
+        for name, fn in stages_for(size):
+            if only and name not in only:
+                continue
+            timings, peak_kib = measure(fn, repeat)
+            results.append(
+                {
+                    "stage": name,
+                    "tasks": size,
+                    "p50_ms": statistics.median(timings),
+                    "p95_ms": _percentile(timings, 95),
+                    "peak_kib": peak_kib,
+                }
+            )
+    set_model_override(None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages against the fake Gemini backend.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated model latency per call")
+    parser.add_argument("--stage", action="append", help="Only run the named stage (repeatable)")
+    parser.add_argument("--json", help="Write results (with the current commit) to this file")
+    args = parser.parse_args()
+    results = run(args.sizes, args.repeat, args.latency_ms, args.stage)
+    print(f"{'stage':<28}{'tasks':>7}{'p50 ms':>11}{'p95 ms':>11}{'peak KiB':>11}")
+    for row in results:
+        print(f"{row['stage']:<28}{row['tasks']:>7}{row['p50_ms']:>11.2f}{row['p95_ms']:>11.2f}{row['peak_kib']:>11.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"commit": _commit(), "repeat": args.repeat, "results": results}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
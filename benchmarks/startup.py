@@ -0,0 +1,71 @@
+"""Startup benchmark: cold import time, first render and rerun of the Streamlit app.
+
+Run with `python -m benchmarks.startup`. Every sample runs in a fresh interpreter
+so module caches do not carry over. The app runs headless through Streamlit's
+AppTest against the fake Gemini backend and a throwaway SQLite database.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+IMPORT_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import core.ai_processing, core.storage
+print(json.dumps({"import_ms": (time.perf_counter() - start) * 1000}))
+"""
+
+RENDER_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+from core.storage import authenticate_user, create_user, init_db
+ready = time.perf_counter()
+init_db()
+create_user("bench", "bench")
+app = AppTest.from_file("app.py", default_timeout=60)
+app.session_state["user"] = authenticate_user("bench", "bench")
+first = time.perf_counter()
+app.run()
+second = time.perf_counter()
+app.run()
+third = time.perf_counter()
+assert not app.exception, app.exception
+print(json.dumps({
+    "harness_ms": (ready - start) * 1000,
+    "first_render_ms": (second - first) * 1000,
+    "rerun_ms": (third - second) * 1000,
+}))
+"""
+
+
+def _sample(script, db_path):
+    env = dict(os.environ, GEMINI_BACKEND="fake", DB_URL=f"sqlite:///{db_path}", PYTHONWARNINGS="ignore")
+    result = subprocess.run(
+        [sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    samples = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(args.runs):
+            db_path = os.path.join(tmp, f"startup-{run}.db")
+            for script in (IMPORT_SCRIPT, RENDER_SCRIPT):
+                for key, value in _sample(script, db_path).items():
+                    samples.setdefault(key, []).append(value)
+    print(f"{'metric':>16} {'median ms':>10} {'min ms':>8}")
+    for key, values in samples.items():
+        print(f"{key:>16} {statistics.median(values):>10.1f} {min(values):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Multi-session storage load test.
+
+Simulates N concurrent users, each registering, logging in, saving plans and
+listing their history, and reports ops/sec and tail latency per operation.
+Points at a throwaway SQLite file unless `--db-url` (or DB_URL) says otherwise.
+
+    python -m benchmarks.storage_load --users 32 --iterations 50
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+OPERATIONS = ["create_user", "authenticate_user", "save_plan", "list_plan_summaries", "list_plans"]
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _sample_tasks(count):
+    return [
+        {
+            "task": f"Task {i}",
+            "category": "Work",
+            "priority": "Urgent & Important" if i % 2 else "Important & Not Urgent",
+            "type": "Deep Task" if i % 3 == 0 else "Micro Task",
+            "done": False,
+        }
+        for i in range(count)
+    ]
+
+
+def simulate_user(storage, scheduling, iterations, tasks_per_plan, latencies, errors, lock):
+    def timed(name, fn, *args):
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception as exc:
+            with lock:
+                errors[name].append(repr(exc))
+            return None
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies[name].append(elapsed)
+        return result
+
+    username = f"load-{uuid.uuid4().hex[:12]}"
+    user = timed("create_user", storage.create_user, username, "secret")
+    if user is None:
+        return
+    for i in range(iterations):
+        timed("authenticate_user", storage.authenticate_user, username, "secret")
+        tasks = _sample_tasks(tasks_per_plan)
+        scheduled = scheduling.schedule_tasks(tasks)
+        blocks = scheduling.create_focus_blocks(tasks)
+        timed("save_plan", storage.save_plan, user["id"], f"Plan {i}", "transcript " * 50, tasks, tasks, scheduled, blocks)
+        timed("list_plan_summaries", storage.list_plan_summaries, user["id"], 5)
+        timed("list_plans", storage.list_plans, user["id"], 5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent storage load test.")
+    parser.add_argument("--users", type=int, default=16, help="Concurrent simulated users")
+    parser.add_argument("--iterations", type=int, default=20, help="Save/list rounds per user")
+    parser.add_argument("--tasks", type=int, default=10, help="Tasks per saved plan")
+    parser.add_argument("--db-url", help="Database URL (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    if args.db_url:
+        os.environ["DB_URL"] = args.db_url
+    elif "DB_URL" not in os.environ:
+        os.environ["DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+    # Imported late so the engine is built for the URL chosen above.
+    from core import scheduling, storage
+
+    storage.init_db()
+    latencies, errors = defaultdict(list), defaultdict(list)
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(
+            target=simulate_user,
+            args=(storage, scheduling, args.iterations, args.tasks, latencies, errors, lock),
+        )
+        for _ in range(args.users)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total_ops = sum(len(v) for v in latencies.values())
+    print(f"DB: {os.environ['DB_URL']}")
+    print(f"{args.users} users x {args.iterations} iterations in {elapsed:.2f}s: {total_ops / elapsed:.1f} ops/sec")
+    print(f"{'operation':<22}{'count':>7}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}")
+    for name in OPERATIONS:
+        samples = latencies.get(name, [])
+        if not samples:
+            print(f"{name:<22}{0:>7}{'':>45}{len(errors.get(name, [])):>8}")
+            continue
+        print(
+            f"{name:<22}{len(samples):>7}{len(samples) / elapsed:>9.1f}{statistics.median(samples):>9.2f}"
+            f"{_percentile(samples, 95):>9.2f}{_percentile(samples, 99):>9.2f}{max(samples):>9.2f}"
+            f"{len(errors.get(name, [])):>8}"
+        )
+    for name, messages in errors.items():
+        print(f"first {name} error: {messages[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark: segment-tree first-fit calendar packing vs. a linear day scan.
+
+Run with `python -m benchmarks.timeslots`. Uses synthetic labelled tasks, so no
+API key or database is needed.
+"""
+import argparse
+import random
+import time
+from datetime import date
+
+from core import timeslots
+from core.ai_processing import PRIORITIES, TASK_TYPES
+
+
+def _tasks(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        {"task": f"Task {i}", "priority": rng.choice(PRIORITIES), "type": rng.choice(TASK_TYPES)}
+        for i in range(count)
+    ]
+
+
+class _LinearCapacity:
+    """Reference first-fit that scans days in order."""
+
+    def __init__(self, capacities):
+        self.free = list(capacities)
+
+    def first_fit(self, minutes):
+        for day, free in enumerate(self.free):
+            if free >= minutes:
+                return day
+        return None
+
+    def take(self, day, minutes):
+        self.free[day] -= minutes
+
+
+def _run(tasks, horizon, tree_class, repeat):
+    original = timeslots._CapacityTree
+    timeslots._CapacityTree = tree_class
+    try:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = timeslots.plan_calendar(tasks, start=date(2026, 1, 5), horizon_days=horizon)
+            best = min(best, time.perf_counter() - start)
+        return best, result
+    finally:
+        timeslots._CapacityTree = original
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(f"{'tasks':>7} {'days':>6} {'tree ms':>9} {'linear ms':>10} {'slots':>7} {'unscheduled':>12}")
+    for size in args.sizes:
+        tasks = _tasks(size)
+        # Enough working days for every block, so the horizon grows with the task count.
+        horizon = max(5, size // 3)
+        tree_time, result = _run(tasks, horizon, timeslots._CapacityTree, args.repeat)
+        linear_time, reference = _run(tasks, horizon, _LinearCapacity, args.repeat)
+        assert [s["start"] for s in result["slots"]] == [s["start"] for s in reference["slots"]]
+        print(
+            f"{size:>7} {horizon:>6} {tree_time * 1000:>9.1f} {linear_time * 1000:>10.1f} "
+            f"{len(result['slots']):>7} {len(result['unscheduled']):>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,50 @@
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from google.api_core import exceptions as google_exceptions
 
-from core.gemini_client import get_client
+from core.audio import is_wav, preprocess_wav, split_wav, stitch_transcripts, wav_duration
+from core.cache import make_key, response_cache
+from core.gemini_client import get_client, get_request_options, profile_of, reload_client
+from core.metrics import record_cache, record_model_call, stage, timed
+from core.rate_limit import gemini_limiter
+from core.storage import get_transcription, invalidate_transcriptions, store_transcription
+
+
+CATEGORIES = ["Work", "Study", "Errand", "Personal", "Health", "Finance", "Other"]
+PRIORITIES = [
+    "Urgent & Important",
+    "Urgent & Not Important",
+    "Important & Not Urgent",
+    "Not Urgent & Not Important",
+]
+TASK_TYPES = ["Deep Task", "Micro Task", "Other"]
+
+TRANSCRIBE_PROMPT = "Transcribe this audio to clean readable English text. No summarizing. Pure transcription only."
+TRANSCRIBE_PROMPT_HASH = hashlib.sha256(TRANSCRIBE_PROMPT.encode()).hexdigest()[:16]
+CHUNK_MAX_TASKS = 150
+CHUNK_MAX_CHARS = 12000
+CHUNK_MAX_WORKERS = 4
+
+LONG_AUDIO_THRESHOLD_SECONDS = 180
+LONG_AUDIO_SEGMENT_SECONDS = 60.0
+LONG_AUDIO_MAX_WORKERS = 4
+
+FUSED_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "task": {"type": "STRING"},
+            "category": {"type": "STRING", "enum": CATEGORIES},
+            "priority": {"type": "STRING", "enum": PRIORITIES},
+            "type": {"type": "STRING", "enum": TASK_TYPES},
+        },
+        "required": ["task", "category", "priority", "type"],
+    },
+}
 
 
 class GeminiQuotaError(Exception):
@@ -11,9 +55,128 @@ class GeminiClientError(Exception):
     """Raised for other Gemini API failures."""
 
 
-def _call_model(model, parts):
+class CachedResponse:
+    """Minimal stand-in for a Gemini response served from the response cache."""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def cache_stats():
+    return response_cache.snapshot()
+
+
+def limiter_state():
+    return gemini_limiter.state()
+
+
+def _cache_key(model, parts, generation_config=None):
+    model_name = getattr(model, "model_name", type(model).__name__)
+    # Profiles can share a model name but not a default generation config.
+    return make_key(model_name, parts, [generation_config, getattr(model, "_generation_config", None)])
+
+
+def _forget_response(model, parts, generation_config=None):
+    """Drop a cached response that turned out to be unusable so the next call asks again."""
+    response_cache.delete(_cache_key(model, parts, generation_config))
+
+
+def _call_model(model, parts, generation_config=None, use_cache=None, request_options=None):
+    if request_options is None:
+        request_options = get_request_options(profile_of(model))
+    if use_cache is None:
+        use_cache = response_cache.enabled
+    if not use_cache:
+        return _generate(model, parts, generation_config, request_options)
+    model_name = getattr(model, "model_name", type(model).__name__)
+    key = _cache_key(model, parts, generation_config)
+    cached = response_cache.get(key)
+    record_cache(cached is not None)
+    if cached is not None:
+        return CachedResponse(cached)
+    response = _generate(model, parts, generation_config, request_options)
+    response_cache.set(key, model_name, response.text)
+    return response
+
+
+def _stream_model(model, parts, generation_config=None, use_cache=None, request_options=None):
+    """Yield response text chunks as they arrive; a cache hit yields the cached text at once."""
+    if request_options is None:
+        request_options = get_request_options(profile_of(model))
+    if use_cache is None:
+        use_cache = response_cache.enabled
+    model_name = getattr(model, "model_name", type(model).__name__)
+    key = _cache_key(model, parts, generation_config)
+    if use_cache:
+        cached = response_cache.get(key)
+        record_cache(cached is not None)
+        if cached is not None:
+            yield cached
+            return
+    start = time.perf_counter()
+    # The limiter slot stays taken until the stream is drained, failed or abandoned.
+    chunk, chunks, retries = _generate(model, parts, generation_config, request_options, stream=True)
+    pieces = []
+    usage = None
+    succeeded = False
     try:
-        return model.generate_content(parts)
+        while chunk is not None:
+            pieces.append(chunk.text)
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            yield chunk.text
+            chunk = next(chunks, None)
+        succeeded = True
+    except google_exceptions.GoogleAPICallError as exc:
+        raise GeminiClientError("Gemini stream was interrupted.") from exc
+    finally:
+        gemini_limiter.release(succeeded=succeeded)
+    record_model_call(model_name, parts, "".join(pieces), time.perf_counter() - start, retries, usage, streamed=True)
+    if use_cache:
+        response_cache.set(key, model_name, "".join(pieces))
+
+
+def _iter_lines(chunks):
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split("\n")
+        yield from lines
+    if buffer:
+        yield buffer
+
+
+def _generate(model, parts, generation_config=None, request_options=None, stream=False):
+    kwargs = {}
+    if generation_config is not None:
+        kwargs["generation_config"] = generation_config
+    if request_options:
+        kwargs["request_options"] = request_options
+    if stream:
+        kwargs["stream"] = True
+
+    attempts = 0
+
+    def call():
+        nonlocal attempts
+        attempts += 1
+        response = model.generate_content(parts, **kwargs)
+        if not stream:
+            return response
+        # Pull the first chunk under the limiter so quota errors on open are retried.
+        chunks = iter(response)
+        return next(chunks, None), chunks, attempts - 1
+
+    start = time.perf_counter()
+    try:
+        try:
+            response = gemini_limiter.run(call, retry_on=(google_exceptions.ResourceExhausted,), hold=stream)
+        except (google_exceptions.Unauthenticated, google_exceptions.PermissionDenied):
+            # The key may have been rotated in `.env`; retry once with a client for the new key.
+            fresh = reload_client(model)
+            if fresh is None:
+                raise
+            model = fresh
+            response = gemini_limiter.run(call, retry_on=(google_exceptions.ResourceExhausted,), hold=stream)
     except google_exceptions.ResourceExhausted as exc:
         raise GeminiQuotaError(
             "Gemini quota exceeded. Please wait and retry or update your plan/billing."
@@ -22,18 +185,194 @@ def _call_model(model, parts):
         raise GeminiClientError("Gemini API call failed.") from exc
     except Exception as exc:  # pragma: no cover - catch-all for SDK edge cases
         raise GeminiClientError("Unexpected Gemini error.") from exc
+    if not stream:
+        record_model_call(
+            getattr(model, "model_name", type(model).__name__),
+            parts,
+            response.text,
+            time.perf_counter() - start,
+            attempts - 1,
+            getattr(response, "usage_metadata", None),
+        )
+    return response
 
 
+@timed("transcribe_audio")
 def transcribe_audio(audio_bytes, mime_type):
     model = get_client()
-    prompt = "Transcribe this audio to clean readable English text. No summarizing. Pure transcription only."
-    response = _call_model(model, [prompt, {"mime_type": mime_type, "data": audio_bytes}])
+    response = _call_model(model, [TRANSCRIBE_PROMPT, {"mime_type": mime_type, "data": audio_bytes}])
     return response.text.strip()
 
 
-def extract_tasks(transcript):
-    model = get_client()
-    prompt = f"""Extract actionable tasks from this transcript.
+def audio_hash(audio_bytes):
+    return hashlib.sha256(audio_bytes).hexdigest()
+
+
+def cached_transcription(audio_bytes, mime_type):
+    """Return a stored transcription for identical audio under the current prompt, if any."""
+    return get_transcription(audio_hash(audio_bytes), mime_type, TRANSCRIBE_PROMPT_HASH)
+
+
+def remember_transcription(audio_bytes, mime_type, text):
+    store_transcription(audio_hash(audio_bytes), mime_type, TRANSCRIBE_PROMPT_HASH, text, len(audio_bytes))
+
+
+def purge_stale_transcriptions():
+    """Drop stored transcriptions produced by an older transcription prompt."""
+    return invalidate_transcriptions(keep_prompt_hash=TRANSCRIBE_PROMPT_HASH)
+
+
+def iter_transcribe_long_audio(
+    audio_bytes,
+    mime_type="audio/wav",
+    segment_seconds=LONG_AUDIO_SEGMENT_SECONDS,
+    max_workers=LONG_AUDIO_MAX_WORKERS,
+):
+    """Transcribe WAV audio in parallel segments, yielding the stitched transcript as it grows.
+
+    Each yielded value covers the longest run of finished segments from the start,
+    so callers can render partial text while later segments are still in flight.
+    """
+    segments = split_wav(audio_bytes, segment_seconds=segment_seconds)
+    texts = [None] * len(segments)
+    ready = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(transcribe_audio, segment, mime_type): i for i, segment in enumerate(segments)}
+        for future in as_completed(futures):
+            texts[futures[future]] = future.result()
+            advanced = ready
+            while advanced < len(texts) and texts[advanced] is not None:
+                advanced += 1
+            if advanced > ready:
+                ready = advanced
+                yield stitch_transcripts(texts[:ready])
+
+
+def transcribe_long_audio(audio_bytes, mime_type="audio/wav", **kwargs):
+    transcript = ""
+    for transcript in iter_transcribe_long_audio(audio_bytes, mime_type, **kwargs):
+        pass
+    return transcript
+
+
+@timed("transcribe_note")
+def transcribe_note(audio_bytes, mime_type, on_partial=None, preprocess=True, on_preprocess=None):
+    """Transcribe an uploaded note, reusing stored results and segmenting long WAV audio.
+
+    WAV audio is shrunk with `preprocess_wav` before upload; stored results stay keyed
+    by the original bytes. `on_preprocess` receives the size stats and `on_partial`
+    the growing transcript while long audio is processed.
+    """
+    transcript = cached_transcription(audio_bytes, mime_type)
+    if transcript is not None:
+        return transcript
+    upload = audio_bytes
+    if preprocess and is_wav(mime_type):
+        with stage("preprocess_wav"):
+            upload, stats = preprocess_wav(audio_bytes)
+        if on_preprocess is not None:
+            on_preprocess(stats)
+    # Unparseable WAV headers (float or extensible formats) fall back to one upload.
+    duration = wav_duration(upload) if is_wav(mime_type) else None
+    if duration is not None and duration > LONG_AUDIO_THRESHOLD_SECONDS:
+        transcript = ""
+        for transcript in iter_transcribe_long_audio(upload, mime_type):
+            if on_partial is not None:
+                on_partial(transcript)
+    else:
+        transcript = transcribe_audio(upload, mime_type)
+    remember_transcription(audio_bytes, mime_type, transcript)
+    return transcript
+
+
+@timed("parse_task_lines")
+def parse_task_lines(text):
+    return [t.strip() for t in text.strip().split("\n") if t.strip()]
+
+
+def _parse_id_lines(text, tasks, start, field_count):
+    """Map `<id> || ...` response lines to positions in `tasks` in one pass.
+
+    IDs are the numbers the prompt listed (offset by `start` for chunked calls).
+    Lines that echo the task text instead of an ID fall back to a dict lookup.
+    """
+    positions = {}
+    by_text = None
+    for line in text.strip().split("\n"):
+        if "||" not in line:
+            continue
+        parts = [p.strip() for p in line.split("||")]
+        if len(parts) != field_count:
+            continue
+        key = parts[0].rstrip(".")
+        if key.isdigit() and 0 <= int(key) - start < len(tasks):
+            positions[int(key) - start] = parts[1:]
+            continue
+        if by_text is None:
+            by_text = {task: i for i, task in enumerate(tasks)}
+        index = by_text.get(parts[0])
+        if index is not None:
+            positions[index] = parts[1:]
+    return positions
+
+
+@timed("parse_categorized")
+def parse_categorized(text, tasks, start=1):
+    positions = _parse_id_lines(text, tasks, start, 3)
+    results = []
+    for i, task in enumerate(tasks):
+        category, priority = positions.get(i, ("Other", "Not Urgent & Not Important"))
+        results.append(
+            {
+                "task": task,
+                "category": category if category in CATEGORIES else "Other",
+                "priority": priority if priority in PRIORITIES else "Not Urgent & Not Important",
+            }
+        )
+    return results
+
+
+@timed("parse_cognitive_load")
+def parse_cognitive_load(text, tasks, start=1):
+    positions = _parse_id_lines(text, [t["task"] for t in tasks], start, 2)
+    for i, task in enumerate(tasks):
+        # Ensure every task has a type even if the model response didn't map perfectly.
+        task_type = positions.get(i, ("Other",))[0]
+        task["type"] = task_type if task_type in TASK_TYPES else "Other"
+    return tasks
+
+
+def _chunks(items, size_of, max_items=CHUNK_MAX_TASKS, max_chars=CHUNK_MAX_CHARS):
+    """Split items into (start_index, chunk) pairs bounded by count and prompt size."""
+    chunks = []
+    current, current_chars, start = [], 0, 0
+    for i, item in enumerate(items):
+        length = size_of(item) + 8
+        if current and (len(current) >= max_items or current_chars + length > max_chars):
+            chunks.append((start, current))
+            current, current_chars, start = [], 0, i
+        current.append(item)
+        current_chars += length
+    if current:
+        chunks.append((start, current))
+    return chunks
+
+
+def _map_chunks(fn, chunks):
+    if not chunks:
+        return []
+    if len(chunks) == 1:
+        start, chunk = chunks[0]
+        return fn(chunk, start)
+    results = []
+    with ThreadPoolExecutor(max_workers=CHUNK_MAX_WORKERS) as pool:
+        for part in pool.map(lambda pair: fn(pair[1], pair[0]), chunks):
+            results.extend(part)
+    return results
+
+
+def _extract_prompt(transcript):
+    return f"""Extract actionable tasks from this transcript.
 Rules:
 - Start with a verb
 - Short
@@ -44,73 +383,230 @@ Output each task on its own line.
 
 Transcript:
 {transcript}"""
-    response = _call_model(model, prompt)
-    tasks = [t.strip() for t in response.text.strip().split("\n") if t.strip()]
-    return tasks
 
 
+@timed("extract_tasks")
+def extract_tasks(transcript):
+    model = get_client()
+    response = _call_model(model, _extract_prompt(transcript))
+    return parse_task_lines(response.text)
+
+
+def iter_extract_tasks(transcript):
+    """Yield task strings as soon as each response line is complete."""
+    for line in _iter_lines(_stream_model(get_client(), _extract_prompt(transcript))):
+        if line.strip():
+            yield line.strip()
+
+
+@timed("categorize_and_prioritize")
 def categorize_and_prioritize(tasks):
+    """Categorize and prioritize task strings, in parallel size-bounded chunks for large lists."""
+    return _map_chunks(_categorize_chunk, _chunks(tasks, len))
+
+
+def _categorize_chunk(tasks, offset=0):
     model = get_client()
-    task_list = "\n".join([f"{i+1}. {t}" for i, t in enumerate(tasks)])
+    task_list = "\n".join([f"{offset + i + 1}. {t}" for i, t in enumerate(tasks)])
     prompt = f"""For each task, assign category and priority.
 
 Categories: Work, Study, Errand, Personal, Health, Finance, Other
 Priorities: Urgent & Important, Urgent & Not Important, Important & Not Urgent, Not Urgent & Not Important
 
-Output format (one per line):
-<task> || <category> || <priority>
+Output format (one per line, using the task's number as its id):
+<id> || <category> || <priority>
 
 Tasks:
 {task_list}"""
     response = _call_model(model, prompt)
-    results = []
-    for line in response.text.strip().split("\n"):
-        line = line.strip()
-        if not line:
-            continue
-        category = "Other"
-        priority = "Not Urgent & Not Important"
-        task = None
-        if "||" in line:
-            parts = [p.strip() for p in line.split("||")]
-            if len(parts) == 3:
-                task, category, priority = parts
-            else:
-                task = parts[0] if parts and parts[0] else None
-        else:
-            task = line
-        if task:
-            results.append({"task": task, "category": category, "priority": priority})
-    existing_tasks = {r["task"] for r in results}
-    for original in tasks:
-        if original not in existing_tasks:
-            results.append({"task": original, "category": "Other", "priority": "Not Urgent & Not Important"})
-    return results
+    return parse_categorized(response.text, tasks, start=offset + 1)
 
 
+@timed("classify_cognitive_load")
 def classify_cognitive_load(tasks):
+    """Set each task dict's cognitive-load `type`, in parallel size-bounded chunks for large lists."""
+    _map_chunks(_classify_chunk, _chunks(tasks, lambda t: len(t["task"])))
+    return tasks
+
+
+def _classify_chunk(tasks, offset=0):
     model = get_client()
-    task_list = "\n".join([f"{i+1}. {t['task']}" for i, t in enumerate(tasks)])
+    task_list = "\n".join([f"{offset + i + 1}. {t['task']}" for i, t in enumerate(tasks)])
     prompt = f"""Classify each task as:
 - Deep Task (high cognitive load, requires uninterrupted attention)
 - Micro Task (quick, low cognitive load, 1-5 minutes)
 - Other
 
-Output format (one per line):
-<task> || <type>
+Output format (one per line, using the task's number as its id):
+<id> || <type>
 
 Tasks:
 {task_list}"""
     response = _call_model(model, prompt)
-    for line in response.text.strip().split("\n"):
-        if "||" in line:
-            parts = [p.strip() for p in line.split("||")]
-            if len(parts) == 2:
-                for task in tasks:
-                    if task["task"] == parts[0]:
-                        task["type"] = parts[1]
-                        break
+    return parse_cognitive_load(response.text, tasks, start=offset + 1)
+
+
+def _normalize_task(item):
+    if not isinstance(item, dict):
+        return None
+    task = str(item.get("task") or "").strip()
+    if not task:
+        return None
+    category = item.get("category")
+    priority = item.get("priority")
+    task_type = item.get("type")
+    return {
+        "task": task,
+        "category": category if category in CATEGORIES else "Other",
+        "priority": priority if priority in PRIORITIES else "Not Urgent & Not Important",
+        "type": task_type if task_type in TASK_TYPES else "Other",
+    }
+
+
+def _fused_prompt(transcript, output=""):
+    return f"""Extract actionable tasks from this transcript and label each one.
+Rules for task text:
+- Start with a verb
+- Short
+- No feelings
+- No summaries
+- No filler
+For each task give:
+- category: one of {", ".join(CATEGORIES)}
+- priority: one of {", ".join(PRIORITIES)}
+- type: Deep Task (high cognitive load, requires uninterrupted attention), Micro Task (quick, low cognitive load, 1-5 minutes) or Other
+{output}
+Transcript:
+{transcript}"""
+
+
+@timed("extract_tasks_fused")
+def extract_tasks_fused(transcript):
+    """Extract, categorize, prioritize and classify tasks in a single structured-JSON call."""
+    model = get_client()
+    generation_config = {
+        "response_mime_type": "application/json",
+        "response_schema": FUSED_RESPONSE_SCHEMA,
+    }
+    prompt = _fused_prompt(transcript)
+    response = _call_model(model, prompt, generation_config=generation_config)
+    try:
+        return parse_fused(response.text)
+    except GeminiClientError:
+        _forget_response(model, prompt, generation_config)
+        raise
+
+
+STREAM_OUTPUT = "Output one labelled task per line as: <task> || <category> || <priority> || <type>\n"
+
+
+def iter_plan_tasks(transcript, classifier=None):
+    """Yield fully labelled tasks one by one while the fused response streams in.
+
+    Lines without exactly four `||` fields (preambles, code fences) are skipped. If
+    none of the output parses, the cached stream is dropped and `plan_tasks` runs
+    instead. A ready `classifier` overrides labels as in `plan_tasks`.
+    """
+    if classifier is not None and not classifier.ready:
+        classifier = None
+    model = get_client()
+    prompt = _fused_prompt(transcript, STREAM_OUTPUT)
+    produced = skipped = 0
+    for line in _iter_lines(_stream_model(model, prompt)):
+        fields = [part.strip() for part in line.split("||")]
+        task = _normalize_task(dict(zip(("task", "category", "priority", "type"), fields))) if len(fields) == 4 else None
+        if task is None:
+            skipped += bool(line.strip())
+            continue
+        produced += 1
+        yield apply_classifier([task], classifier)[0] if classifier is not None else task
+    if skipped and not produced:
+        _forget_response(model, prompt)
+        yield from plan_tasks(transcript, classifier=classifier)
+
+
+@timed("parse_fused")
+def parse_fused(text):
+    try:
+        items = json.loads(text)
+    except ValueError as exc:
+        raise GeminiClientError("Gemini returned malformed JSON.") from exc
+    if not isinstance(items, list):
+        raise GeminiClientError("Gemini returned an unexpected JSON shape.")
+    return [task for task in (_normalize_task(item) for item in items) if task]
+
+
+@timed("plan_tasks")
+def plan_tasks(transcript, fused=True, classifier=None):
+    """Return fully labelled tasks, preferring the fused call and falling back to three calls.
+
+    A trained `classifier` never adds calls: on the fused path its confident labels
+    replace Gemini's, and on the three-call path confidently labelled tasks skip the
+    labelling prompts.
+    """
+    if classifier is not None and not classifier.ready:
+        classifier = None
+    if fused:
+        try:
+            tasks = extract_tasks_fused(transcript)
+        except GeminiQuotaError:
+            raise
+        except GeminiClientError:
+            pass
+        else:
+            return apply_classifier(tasks, classifier) if classifier is not None else tasks
+    raw_tasks = extract_tasks(transcript)
+    if not raw_tasks:
+        return []
+    return process_tasks_concurrently(raw_tasks, classifier)
+
+
+def apply_classifier(tasks, classifier):
+    """Overwrite labels on already labelled task dicts with the classifier's confident predictions.
+
+    The tasks have been through Gemini already, so no calls are counted as avoided.
+    """
+    local = 0
     for task in tasks:
-        # Ensure every task has a type even if the model response didn't map perfectly.
-        task.setdefault("type", "Other")
+        predicted = classifier.predict(task["task"])
+        if predicted:
+            task.update(predicted)
+            local += 1
+    classifier.record(tasks=len(tasks), fast_labelled=local, sent_to_llm=len(tasks), calls_avoided=0)
     return tasks
+
+
+@timed("process_tasks_concurrently")
+def process_tasks_concurrently(tasks, classifier=None):
+    """Categorize and classify extracted task strings with both prompts in flight at once.
+
+    Labels the `classifier` predicts confidently are used as-is; each prompt only
+    receives the tasks still missing one of its fields, and a prompt with nothing
+    left to label is counted as an avoided call.
+    """
+    predictions = [classifier.predict(t) for t in tasks] if classifier is not None else [{} for _ in tasks]
+    to_categorize = [i for i, p in enumerate(predictions) if "category" not in p or "priority" not in p]
+    to_classify = [i for i, p in enumerate(predictions) if "type" not in p]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        categorized_future = pool.submit(categorize_and_prioritize, [tasks[i] for i in to_categorize])
+        classified_future = pool.submit(classify_cognitive_load, [{"task": tasks[i]} for i in to_classify])
+        categorized = categorized_future.result()
+        classified = classified_future.result()
+    # Both stages return one entry per input task, in input order.
+    for i, labelled in zip(to_categorize, categorized):
+        predictions[i].setdefault("category", labelled["category"])
+        predictions[i].setdefault("priority", labelled["priority"])
+    for i, labelled in zip(to_classify, classified):
+        predictions[i].setdefault("type", labelled["type"])
+    if classifier is not None:
+        sent = set(to_categorize) | set(to_classify)
+        classifier.record(
+            tasks=len(tasks),
+            fast_labelled=len(tasks) - len(sent),
+            sent_to_llm=len(sent),
+            calls_avoided=int(not to_categorize) + int(not to_classify),
+        )
+    return [
+        {"task": task, "category": p["category"], "priority": p["priority"], "type": p["type"]}
+        for task, p in zip(tasks, predictions)
+    ]
@@ -0,0 +1,272 @@
+import io
+import math
+import re
+import wave
+
+import numpy as np
+
+WINDOW_SECONDS = 0.02
+SPEECH_SAMPLE_RATE = 16000
+SILENCE_THRESHOLD_DB = -45.0
+SILENCE_PADDING_SECONDS = 0.25
+RESAMPLE_BLOCK_FRAMES = 1 << 16
+RESAMPLE_ZERO_CROSSINGS = 16
+RESAMPLE_ROLLOFF = 0.94
+TRIM_BLOCK_SAMPLES = 1 << 20
+SAMPLE_WIDTHS = (1, 2, 3, 4)
+MIME_TYPES = {"wav": "audio/wav", "mp3": "audio/mp3", "m4a": "audio/mp4"}
+
+
+def mime_type_for(filename):
+    return MIME_TYPES.get(filename.rsplit(".", 1)[-1].lower(), "audio/wav")
+
+
+def is_wav(mime_type):
+    return mime_type in ("audio/wav", "audio/x-wav", "audio/wave")
+
+
+def _read_wav(audio_bytes):
+    with wave.open(io.BytesIO(audio_bytes), "rb") as wav:
+        params = wav.getparams()
+        frames = wav.readframes(params.nframes)
+    return params, frames
+
+
+def _to_mono_float(frames, params):
+    """Decode PCM frames to a mono float array in [-1, 1]."""
+    width = params.sampwidth
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        ints = raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16)
+        ints = np.where(ints >= 1 << 23, ints - (1 << 24), ints)
+        samples = ints.astype(np.float32) / float(1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width}")
+    return samples.reshape(-1, params.nchannels).mean(axis=1)
+
+
+def wav_duration(audio_bytes):
+    """Length in seconds, or None when the bytes are not PCM WAV this module can decode."""
+    try:
+        with wave.open(io.BytesIO(audio_bytes), "rb") as wav:
+            if wav.getsampwidth() not in SAMPLE_WIDTHS or not wav.getframerate():
+                return None
+            return wav.getnframes() / float(wav.getframerate())
+    except (wave.Error, EOFError, ValueError):
+        return None
+
+
+def _window_rms(mono, window):
+    usable = len(mono) // window * window
+    if not usable:
+        return np.zeros(0, dtype=np.float32)
+    blocks = mono[:usable].reshape(-1, window)
+    return np.sqrt(np.mean(blocks * blocks, axis=1))
+
+
+def _silence_cuts(mono, framerate, segment_seconds, search_seconds):
+    """Frame indices to cut at: the quietest window near each segment boundary."""
+    window = max(1, int(framerate * WINDOW_SECONDS))
+    rms = _window_rms(mono, window)
+    total = len(mono)
+    step = int(segment_seconds * framerate)
+    search = int(search_seconds * framerate) // window
+    cuts = [0]
+    target = step
+    while target < total - step // 4:
+        centre = target // window
+        lo = max(cuts[-1] // window + 1, centre - search)
+        hi = min(len(rms), centre + search + 1)
+        cut = target if lo >= hi else (lo + int(np.argmin(rms[lo:hi]))) * window
+        cuts.append(cut)
+        target = cut + step
+    cuts.append(total)
+    return cuts
+
+
+def _encode_wav(params, frames):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(params.nchannels)
+        wav.setsampwidth(params.sampwidth)
+        wav.setframerate(params.framerate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+def _iter_wav_blocks(wav, frames_per_block):
+    params = wav.getparams()
+    while True:
+        frames = wav.readframes(frames_per_block)
+        if not frames:
+            return
+        yield _to_mono_float(frames, params)
+
+
+def _blackman(x):
+    return 0.42 + 0.5 * np.cos(np.pi * x) + 0.08 * np.cos(2 * np.pi * x)
+
+
+def _resample_blocks(blocks, rate, target_rate, total_frames, zero_crossings=RESAMPLE_ZERO_CROSSINGS):
+    """Polyphase resampling of mono float blocks with a Blackman-windowed sinc low-pass.
+
+    The filter cuts off just below the target Nyquist frequency, so content that
+    would alias is removed before decimation. Output samples fall on `up` distinct
+    phases between input samples, so the kernel is tabulated once per phase. Only
+    one input block plus the filter's reach is held at a time.
+    """
+    if rate <= target_rate:
+        yield from blocks
+        return
+    common = math.gcd(rate, target_rate)
+    up, down = target_rate // common, rate // common
+    cutoff = 0.5 * up / down * RESAMPLE_ROLLOFF
+    reach = int(np.ceil(zero_crossings * down / up))
+    offsets = np.arange(-reach + 1, reach + 1)
+    distance = (np.arange(up) / up)[:, None] - offsets[None, :]
+    table = (2 * cutoff * np.sinc(2 * cutoff * distance) * _blackman(distance / reach)).astype(np.float32)
+    count = total_frames * up // down
+    keep = 2 * reach + down // up + 1
+    history = np.zeros(reach, dtype=np.float32)
+    origin = -reach  # input index of history[0]
+    produced = 0
+    for block in _padded(blocks, reach):
+        buffer = np.concatenate((history, block))
+        end = origin + len(buffer)
+        # Output n needs input up to n * down // up + reach, which must lie inside the buffer.
+        last = min(count, max(0, -(-(end - reach) * up // down)))
+        if last > produced:
+            steps = np.arange(produced, last, dtype=np.int64) * down
+            base, phase = steps // up, steps % up
+            taps = buffer[(base - origin)[:, None] + offsets[None, :]]
+            yield np.einsum("ij,ij->i", taps, table[phase])
+            produced = last
+        history = buffer[-keep:]
+        origin = end - len(history)
+
+
+def _padded(blocks, size):
+    yield from blocks
+    yield np.zeros(size, dtype=np.float32)
+
+
+def _loud_range(pcm, rate, threshold_db, padding_seconds):
+    """(start, end) sample bounds of `pcm` without edge silence, or None if it is all silence."""
+    window = max(1, int(rate * WINDOW_SECONDS))
+    chunk = window * max(1, TRIM_BLOCK_SAMPLES // window)
+    threshold = 10 ** (threshold_db / 20.0)
+    first = last = None
+    for offset in range(0, len(pcm) // window * window, chunk):
+        rms = _window_rms(pcm[offset:offset + chunk].astype(np.float32) / 32768.0, window)
+        loud = np.flatnonzero(rms > threshold)
+        if len(loud):
+            if first is None:
+                first = offset + loud[0] * window
+            last = offset + (loud[-1] + 1) * window
+    if first is None:
+        return None
+    padding = int(padding_seconds * rate)
+    return max(0, first - padding), min(len(pcm), last + padding)
+
+
+def preprocess_wav(
+    audio_bytes,
+    target_rate=SPEECH_SAMPLE_RATE,
+    threshold_db=SILENCE_THRESHOLD_DB,
+    padding_seconds=SILENCE_PADDING_SECONDS,
+):
+    """Downmix to mono, resample to a speech rate and trim edge silence as 16-bit PCM.
+
+    Returns (wav_bytes, stats); the original bytes come back if the result is not
+    smaller or the WAV cannot be decoded (e.g. float or extensible formats).
+    """
+    try:
+        with wave.open(io.BytesIO(audio_bytes), "rb") as wav:
+            params = wav.getparams()
+            if params.sampwidth not in SAMPLE_WIDTHS or not params.framerate:
+                raise ValueError(f"Unsupported WAV sample width: {params.sampwidth}")
+            rate = min(params.framerate, target_rate)
+            blocks = _iter_wav_blocks(wav, RESAMPLE_BLOCK_FRAMES)
+            pcm = np.concatenate(
+                [np.zeros(0, dtype="<i2")]
+                + [
+                    (np.clip(block, -1.0, 1.0) * 32767.0).astype("<i2")
+                    for block in _resample_blocks(blocks, params.framerate, target_rate, params.nframes)
+                ]
+            )
+    except (wave.Error, EOFError, ValueError):
+        return audio_bytes, _preprocess_stats(audio_bytes, audio_bytes, None)
+    bounds = _loud_range(pcm, rate, threshold_db, padding_seconds)
+    if bounds is not None:
+        pcm = pcm[bounds[0]:bounds[1]]
+    processed = _encode_wav(params._replace(nchannels=1, sampwidth=2, framerate=rate), pcm.tobytes())
+    if len(processed) >= len(audio_bytes):
+        processed, rate = audio_bytes, params.framerate
+    return processed, _preprocess_stats(audio_bytes, processed, rate)
+
+
+def _preprocess_stats(original, processed, rate):
+    return {
+        "original_bytes": len(original),
+        "processed_bytes": len(processed),
+        "bytes_saved": len(original) - len(processed),
+        "sample_rate": rate,
+    }
+
+
+def split_wav(audio_bytes, segment_seconds=60.0, overlap_seconds=1.0, search_seconds=5.0):
+    """Split WAV bytes into overlapping WAV segments cut at the quietest point near each boundary."""
+    params, frames = _read_wav(audio_bytes)
+    mono = _to_mono_float(frames, params)
+    cuts = _silence_cuts(mono, params.framerate, segment_seconds, search_seconds)
+    frame_size = params.sampwidth * params.nchannels
+    overlap = int(overlap_seconds * params.framerate)
+    segments = []
+    for start, end in zip(cuts, cuts[1:]):
+        start = max(0, start - overlap)
+        end = min(len(mono), end + overlap)
+        segments.append(_encode_wav(params, frames[start * frame_size:end * frame_size]))
+    return segments
+
+
+_WORD = re.compile(r"\S+")
+
+
+def stitch_transcripts(parts, max_overlap_words=12):
+    """Join segment transcripts, dropping words repeated across the overlap between neighbours.
+
+    Line and paragraph breaks inside a segment are kept; segments are joined by a
+    space unless the text left after the overlap starts on a new line.
+    """
+    words = []
+    stitched = ""
+    for text in parts:
+        matches = list(_WORD.finditer(text))
+        incoming = [match.group() for match in matches]
+        if not incoming:
+            continue
+        overlap = 0
+        limit = min(max_overlap_words, len(words), len(incoming))
+        for size in range(limit, 0, -1):
+            tail = [w.strip(".,!?;:").lower() for w in words[-size:]]
+            head = [w.strip(".,!?;:").lower() for w in incoming[:size]]
+            if tail == head:
+                overlap = size
+                break
+        if overlap == len(incoming):
+            continue
+        rest = text[matches[overlap].start():].rstrip()
+        if stitched:
+            gap = text[matches[overlap - 1].end():matches[overlap].start()] if overlap else text[:matches[0].start()]
+            newlines = gap.count("\n")
+            stitched += ("\n\n" if newlines > 1 else "\n" if newlines else " ") + rest
+        else:
+            stitched = rest
+        words.extend(incoming[overlap:])
+    return stitched
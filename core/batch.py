@@ -0,0 +1,140 @@
+"""Headless batch planner: turn a directory or NDJSON file of notes into saved plans.
+
+Usage:
+    python -m core.batch notes/ --user-id 1 --concurrency 8
+    python -m core.batch notes.ndjson --user-id 1 --state import.done.ndjson
+
+A directory may hold audio files (.wav, .mp3, .m4a) and transcripts (.txt).
+NDJSON lines look like {"id": "...", "transcript": "..."} or
+{"id": "...", "audio_path": "...", "title": "..."}. Finished note ids are
+appended to the state file, so re-running the same command resumes the import.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from core.ai_processing import GeminiQuotaError, plan_tasks, transcribe_note
+from core.audio import MIME_TYPES, mime_type_for
+from core.scheduling import create_focus_blocks, schedule_tasks
+from core.storage import init_db, save_plan
+
+TEXT_EXTENSIONS = {"txt"}
+
+
+def iter_notes(source, errors=None):
+    """Yield note dicts with an `id` plus either `transcript` or `audio_path`.
+
+    Malformed NDJSON lines are skipped; (line_no, reason) pairs go to `errors` if given.
+    """
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                note_id = os.path.relpath(path, source)
+                ext = name.rsplit(".", 1)[-1].lower()
+                title = os.path.splitext(name)[0]
+                if ext in TEXT_EXTENSIONS:
+                    with open(path, encoding="utf-8") as handle:
+                        yield {"id": note_id, "title": title, "transcript": handle.read()}
+                elif ext in MIME_TYPES:
+                    yield {"id": note_id, "title": title, "audio_path": path}
+        return
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as handle:
+        for line_no, line in enumerate(handle, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                if errors is not None:
+                    errors.append((line_no, f"invalid JSON: {exc}"))
+                continue
+            if not isinstance(record, dict):
+                if errors is not None:
+                    errors.append((line_no, "record is not an object"))
+                continue
+            record.setdefault("id", f"line-{line_no}")
+            if record.get("audio_path") and not os.path.isabs(record["audio_path"]):
+                record["audio_path"] = os.path.join(base_dir, record["audio_path"])
+            yield record
+
+
+def load_done(state_path):
+    if not os.path.exists(state_path):
+        return set()
+    with open(state_path, encoding="utf-8") as handle:
+        return {json.loads(line)["id"] for line in handle if line.strip()}
+
+
+def process_note(note, user_id, fused=True):
+    transcript = note.get("transcript")
+    if transcript is None:
+        with open(note["audio_path"], "rb") as handle:
+            audio_bytes = handle.read()
+        transcript = transcribe_note(audio_bytes, note.get("mime_type") or mime_type_for(note["audio_path"]))
+    tasks = plan_tasks(transcript, fused=fused)
+    scheduled = schedule_tasks(tasks)
+    blocks = create_focus_blocks(tasks)
+    plan = save_plan(user_id, note.get("title"), transcript, tasks, tasks, scheduled, blocks)
+    return plan.id, len(tasks)
+
+
+def run(source, user_id, concurrency=4, state_path=None, fused=True, out=sys.stdout):
+    state_path = state_path or f"{source.rstrip(os.sep)}.done.ndjson"
+    done = load_done(state_path)
+    parse_errors = []
+    pending = [note for note in iter_notes(source, parse_errors) if note["id"] not in done]
+    print(f"{len(done)} notes already done, {len(pending)} to process.", file=out)
+    for line_no, reason in parse_errors:
+        print(f"[skipped] line {line_no}: {reason}", file=out)
+    state_lock = threading.Lock()
+    completed = 0
+    failed = len(parse_errors)
+    start = time.perf_counter()
+    with open(state_path, "a", encoding="utf-8") as state, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(process_note, note, user_id, fused): note for note in pending}
+        for future in as_completed(futures):
+            note = futures[future]
+            try:
+                plan_id, task_count = future.result()
+            except GeminiQuotaError as exc:
+                failed += 1
+                print(f"[quota] {note['id']}: {exc}", file=out)
+                continue
+            except Exception as exc:
+                failed += 1
+                print(f"[error] {note['id']}: {exc}", file=out)
+                continue
+            with state_lock:
+                state.write(json.dumps({"id": note["id"], "plan_id": plan_id, "tasks": task_count}) + "\n")
+                state.flush()
+            completed += 1
+            elapsed = time.perf_counter() - start
+            print(f"[ok] {note['id']} -> plan {plan_id} ({task_count} tasks, {completed / elapsed * 60:.1f} notes/min)", file=out)
+    elapsed = time.perf_counter() - start
+    rate = completed / elapsed * 60 if elapsed else 0.0
+    print(f"Done: {completed} saved, {failed} failed in {elapsed:.1f}s ({rate:.1f} notes/min).", file=out)
+    return completed, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-process notes into saved plans.")
+    parser.add_argument("source", help="Directory of audio/.txt notes or an NDJSON file")
+    parser.add_argument("--user-id", type=int, required=True, help="Owner of the saved plans")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum notes processed at once")
+    parser.add_argument("--state", help="Resume file of finished note ids (default: <source>.done.ndjson)")
+    parser.add_argument("--no-fused", action="store_true", help="Use the three-call extraction path")
+    args = parser.parse_args(argv)
+    init_db()
+    _, failed = run(args.source, args.user_id, args.concurrency, args.state, fused=not args.no_fused)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_PATH = os.getenv("AI_CACHE_PATH", "planner_cache.db")
+CACHE_TTL_SECONDS = int(os.getenv("AI_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "5000"))
+CACHE_MEMORY_ENTRIES = int(os.getenv("AI_CACHE_MEMORY_ENTRIES", "256"))
+CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "1") not in ("0", "false", "False")
+
+
+def _update_hash(digest, part):
+    if isinstance(part, (bytes, bytearray)):
+        digest.update(b"b")
+        digest.update(hashlib.sha256(part).digest())
+    elif isinstance(part, str):
+        digest.update(b"s")
+        digest.update(part.encode())
+    elif isinstance(part, dict):
+        digest.update(b"d")
+        for key in sorted(part):
+            digest.update(str(key).encode())
+            _update_hash(digest, part[key])
+    elif isinstance(part, (list, tuple)):
+        digest.update(b"l")
+        for item in part:
+            _update_hash(digest, item)
+    else:
+        digest.update(b"j")
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+
+
+def make_key(model_name, parts, extra=None):
+    """Stable cache key for a model name plus prompt parts (raw bytes are hashed, not stored)."""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode())
+    _update_hash(digest, parts)
+    if extra is not None:
+        _update_hash(digest, extra)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Two-tier prompt/response cache: in-process LRU over a SQLite table."""
+
+    def __init__(
+        self,
+        path=CACHE_PATH,
+        ttl_seconds=CACHE_TTL_SECONDS,
+        max_entries=CACHE_MAX_ENTRIES,
+        memory_entries=CACHE_MEMORY_ENTRIES,
+        enabled=CACHE_ENABLED,
+    ):
+        self.enabled = enabled
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_response_cache_last_used ON response_cache (last_used_at)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, text = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return text
+                del self._memory[key]
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT response, created_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            text, created_at = row
+            if self._expired(created_at, now):
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                conn.commit()
+                self.stats["misses"] += 1
+                return None
+            conn.execute("UPDATE response_cache SET last_used_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self._remember(key, created_at, text)
+            self.stats["disk_hits"] += 1
+            return text
+
+    def set(self, key, model_name, text):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, model, response, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, text, now, now),
+            )
+            self._evict(conn, now)
+            conn.commit()
+            self._remember(key, now, text)
+
+    def _remember(self, key, created_at, text):
+        self._memory[key] = (created_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, conn, now):
+        removed = 0
+        if self.ttl_seconds > 0:
+            removed += conn.execute(
+                "DELETE FROM response_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+        if self.max_entries > 0:
+            count = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                removed += conn.execute(
+                    "DELETE FROM response_cache WHERE key IN ("
+                    "SELECT key FROM response_cache ORDER BY last_used_at ASC LIMIT ?)",
+                    (overflow,),
+                ).rowcount
+        self.stats["evictions"] += removed
+
+    def delete(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+            conn = self._connection()
+            conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            conn = self._connection()
+            conn.execute("DELETE FROM response_cache")
+            conn.commit()
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+response_cache = ResponseCache()
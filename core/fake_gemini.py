@@ -0,0 +1,157 @@
+"""Offline stand-in for `genai.GenerativeModel`.
+
+Answers the planner's prompts deterministically (or from recorded fixtures) with
+configurable latency and injectable quota errors, so the pipeline can be
+benchmarked and exercised without an API key. Enable it for the app with
+`GEMINI_BACKEND=fake`.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+
+from google.api_core import exceptions as google_exceptions
+
+from core.ai_processing import CATEGORIES, PRIORITIES, TASK_TYPES
+from core.cache import make_key
+
+_NUMBERED = re.compile(r"^\s*(\d+)\.\s+(.*)$")
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def _pick(options, text, salt):
+    return options[zlib.crc32(f"{salt}:{text}".encode()) % len(options)]
+
+
+def _section(prompt, header):
+    _, _, body = prompt.partition(header)
+    return body.strip()
+
+
+def _numbered_tasks(prompt):
+    tasks = []
+    for line in _section(prompt, "Tasks:").split("\n"):
+        match = _NUMBERED.match(line)
+        if match:
+            tasks.append((int(match.group(1)), match.group(2).strip()))
+    return tasks
+
+
+def _sentences(transcript):
+    parts = re.split(r"[.!?\n]+", transcript)
+    return [p.strip().capitalize() for p in parts if p.strip()]
+
+
+def label(task):
+    """Deterministic (category, priority, type) for a task string."""
+    return _pick(CATEGORIES, task, "c"), _pick(PRIORITIES, task, "p"), _pick(TASK_TYPES, task, "t")
+
+
+def respond(parts, generation_config=None):
+    """Build the deterministic response text for a planner prompt."""
+    if isinstance(parts, list):
+        if any(isinstance(p, dict) and "data" in p for p in parts):
+            size = sum(len(p["data"]) for p in parts if isinstance(p, dict) and "data" in p)
+            return f"Transcribed {size} bytes of audio."
+        prompt = "\n".join(p for p in parts if isinstance(p, str))
+    else:
+        prompt = parts
+    config = generation_config or {}
+    if config.get("response_mime_type") == "application/json":
+        tasks = _sentences(_section(prompt, "Transcript:"))
+        return json.dumps(
+            [dict(zip(("task", "category", "priority", "type"), (t,) + label(t))) for t in tasks]
+        )
+    if "Output one labelled task per line" in prompt:
+        tasks = _sentences(_section(prompt, "Transcript:"))
+        return "\n".join(" || ".join((t,) + label(t)) for t in tasks)
+    if prompt.startswith("Extract actionable tasks"):
+        return "\n".join(_sentences(_section(prompt, "Transcript:")))
+    if prompt.startswith("For each task, assign category"):
+        return "\n".join(f"{i} || {label(t)[0]} || {label(t)[1]}" for i, t in _numbered_tasks(prompt))
+    if prompt.startswith("Classify each task"):
+        return "\n".join(f"{i} || {label(t)[2]}" for i, t in _numbered_tasks(prompt))
+    return ""
+
+
+def _stream(text, delay, chunk_chars):
+    """Split `text` into fixed-size chunks, spreading `delay` across them."""
+    pieces = [text[i : i + chunk_chars] for i in range(0, len(text), chunk_chars)] or [""]
+    for piece in pieces:
+        if delay:
+            time.sleep(delay / len(pieces))
+        yield FakeResponse(piece)
+
+
+class FakeGenerativeModel:
+    def __init__(
+        self,
+        model_name="fake-gemini",
+        latency=0.0,
+        jitter=0.0,
+        fixtures=None,
+        quota_error_rate=0.0,
+        seed=0,
+        generation_config=None,
+        stream_chunk_chars=24,
+    ):
+        self.model_name = model_name
+        self.latency = latency
+        self.jitter = jitter
+        self.fixtures = fixtures or {}
+        self.quota_error_rate = quota_error_rate
+        self._generation_config = generation_config
+        self.stream_chunk_chars = stream_chunk_chars
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._forced_errors = 0
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls):
+        fixtures = None
+        path = os.getenv("FAKE_GEMINI_FIXTURES")
+        if path:
+            with open(path, encoding="utf-8") as handle:
+                fixtures = json.load(handle)
+        return cls(
+            latency=float(os.getenv("FAKE_GEMINI_LATENCY_MS", "0")) / 1000.0,
+            jitter=float(os.getenv("FAKE_GEMINI_JITTER_MS", "0")) / 1000.0,
+            fixtures=fixtures,
+            quota_error_rate=float(os.getenv("FAKE_GEMINI_QUOTA_ERROR_RATE", "0")),
+        )
+
+    def fail_next(self, count=1):
+        """Make the next `count` calls raise ResourceExhausted."""
+        with self._lock:
+            self._forced_errors += count
+
+    def fixture_key(self, parts, generation_config=None):
+        return make_key(self.model_name, parts, generation_config)
+
+    def generate_content(self, contents, generation_config=None, request_options=None, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self._forced_errors > 0 or self._random.random() < self.quota_error_rate
+            if self._forced_errors > 0:
+                self._forced_errors -= 1
+        if fail:
+            if delay:
+                time.sleep(delay)
+            raise google_exceptions.ResourceExhausted("Fake quota exhausted.")
+        text = self.fixtures.get(self.fixture_key(contents, generation_config))
+        if text is None:
+            text = respond(contents, generation_config)
+        if stream:
+            return _stream(text, delay, self.stream_chunk_chars)
+        if delay:
+            time.sleep(delay)
+        return FakeResponse(text)
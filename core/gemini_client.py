@@ -1,14 +1,133 @@
 import os
+import threading
 
-import google.generativeai as genai
 from dotenv import load_dotenv
 
 load_dotenv()
 
+DEFAULT_MODEL = "gemini-2.0-flash-exp"
+DEFAULT_PROFILE = "default"
+BACKEND = os.getenv("GEMINI_BACKEND", "google")
 
-def get_client():
+
+def _env_timeout():
+    value = os.getenv("GEMINI_TIMEOUT_SECONDS")
+    return float(value) if value else None
+
+
+# Per-profile model settings; callers pick a profile instead of building models by hand.
+_profiles = {
+    DEFAULT_PROFILE: {
+        "model_name": os.getenv("GEMINI_MODEL", DEFAULT_MODEL),
+        "generation_config": None,
+        "timeout": _env_timeout(),
+    }
+}
+_clients = {}
+_configured_key = None
+_model_override = None
+_lock = threading.Lock()
+
+
+def configure_profile(name, model_name=None, generation_config=None, timeout=None):
+    """Register or update the settings for a named model profile."""
+    with _lock:
+        current = _profiles.get(name, _profiles[DEFAULT_PROFILE])
+        _profiles[name] = {
+            "model_name": model_name or current["model_name"],
+            "generation_config": generation_config,
+            "timeout": timeout if timeout is not None else current["timeout"],
+        }
+        # Dropping the cached model forces a rebuild with the new settings.
+        _clients.pop(name, None)
+
+
+def refresh_api_key():
+    """Re-read `.env` so a rotated key is used by the next get_client() call."""
+    load_dotenv(override=True)
+
+
+def set_model_override(model):
+    """Serve `model` from every get_client() call (None restores the real backend)."""
+    global _model_override
+    _model_override = model
+
+
+def get_client(profile=DEFAULT_PROFILE):
+    if _model_override is not None:
+        return _model_override
+    if BACKEND == "fake":
+        return _fake_client()
     api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        refresh_api_key()
+        api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         raise ValueError("GEMINI_API_KEY not found in environment")
-    genai.configure(api_key=api_key)
-    return genai.GenerativeModel("gemini-2.0-flash-exp")
+    if api_key == _configured_key:
+        model = _clients.get(profile)
+        if model is not None:
+            return model
+    return _build_client(api_key, profile)
+
+
+def _fake_client():
+    global _model_override
+    from core.fake_gemini import FakeGenerativeModel
+
+    with _lock:
+        if _model_override is None:
+            _model_override = FakeGenerativeModel.from_env()
+        return _model_override
+
+
+def _build_client(api_key, profile):
+    global _configured_key
+    # The SDK takes most of a second to import, so it is loaded on the first real call.
+    import google.generativeai as genai
+
+    with _lock:
+        if api_key != _configured_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+            _clients.clear()
+        model = _clients.get(profile)
+        if model is None:
+            settings = _profiles[profile]
+            model = genai.GenerativeModel(
+                settings["model_name"],
+                generation_config=settings["generation_config"],
+            )
+            _clients[profile] = model
+        return model
+
+
+def reload_client(model):
+    """After an auth failure, re-read `.env`; return a client for the new key, or None if it did not change."""
+    previous = _configured_key
+    refresh_api_key()
+    api_key = os.getenv("GEMINI_API_KEY")
+    if _model_override is not None or not api_key or api_key == previous:
+        return None
+    return get_client(profile_of(model))
+
+
+def profile_of(model):
+    """Name of the profile `model` was built for; overrides and fakes count as the default."""
+    with _lock:
+        for name, client in _clients.items():
+            if client is model:
+                return name
+    return DEFAULT_PROFILE
+
+
+def get_request_options(profile=DEFAULT_PROFILE):
+    timeout = _profiles[profile]["timeout"]
+    return {"timeout": timeout} if timeout else None
+
+
+def clear_clients():
+    global _configured_key
+    with _lock:
+        _clients.clear()
+        _configured_key = None
@@ -0,0 +1,186 @@
+"""Incremental task extraction for edited transcripts.
+
+The transcript is cut into content-defined segments: a segment ends at a
+paragraph break, or after a sentence whose hash hits a boundary condition.
+Editing one sentence therefore changes only the segment that contains it.
+Each segment's labelled tasks are cached by content hash, so a re-run sends
+only new or changed segments to Gemini. The cache is shared by every session and
+holds Gemini's labels only; a user's local classifier is applied on the way out.
+"""
+import hashlib
+import queue
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from core.ai_processing import apply_classifier, iter_plan_tasks, plan_tasks
+
+MIN_SENTENCES = 2
+MAX_SENTENCES = 12
+BOUNDARY_MODULUS = 6
+MAX_CACHED_SEGMENTS = 2048
+MAX_WORKERS = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def _normalize(text):
+    return " ".join(text.split())
+
+
+def split_segments(transcript):
+    segments = []
+    for paragraph in _PARAGRAPH_BREAK.split(transcript):
+        current = []
+        for sentence in _SENTENCE_END.split(paragraph):
+            sentence = _normalize(sentence)
+            if not sentence:
+                continue
+            current.append(sentence)
+            at_boundary = zlib.crc32(sentence.encode()) % BOUNDARY_MODULUS == 0
+            if len(current) >= MAX_SENTENCES or (len(current) >= MIN_SENTENCES and at_boundary):
+                segments.append(" ".join(current))
+                current = []
+        if current:
+            segments.append(" ".join(current))
+    return segments
+
+
+def segment_key(segment):
+    return hashlib.sha256(segment.encode()).hexdigest()
+
+
+class SegmentCache:
+    def __init__(self, max_entries=MAX_CACHED_SEGMENTS):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            tasks = self._entries.get(key)
+            if tasks is None:
+                return None
+            self._entries.move_to_end(key)
+            return [dict(task) for task in tasks]
+
+    def set(self, key, tasks):
+        with self._lock:
+            self._entries[key] = [dict(task) for task in tasks]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+segment_cache = SegmentCache()
+
+
+def extract_incremental(
+    transcript, previous_tasks=None, cache=segment_cache, max_workers=MAX_WORKERS, classifier=None
+):
+    """Return (tasks, stats) for `transcript`, re-running Gemini only on changed segments.
+
+    `done` flags from `previous_tasks` carry over to tasks with the same text. A
+    ready `classifier` relabels the tasks after the cache lookup, so cached
+    segments never carry one user's labels over to another.
+    """
+    segments = split_segments(transcript)
+    keys = [segment_key(segment) for segment in segments]
+    results = {}
+    missing = {}
+    for key, segment in zip(keys, segments):
+        if key in results or key in missing:
+            continue
+        cached = cache.get(key)
+        if cached is None:
+            missing[key] = segment
+        else:
+            results[key] = cached
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {key: pool.submit(plan_tasks, segment) for key, segment in missing.items()}
+            for key, future in futures.items():
+                results[key] = future.result()
+                cache.set(key, results[key])
+
+    done_by_text = _done_flags(previous_tasks)
+    tasks = _relabel([_carry_done(task, done_by_text) for key in keys for task in results[key]], classifier)
+    stats = {"segments": len(segments), "reused": len(segments) - len(missing), "sent": len(missing)}
+    return tasks, stats
+
+
+def _relabel(tasks, classifier):
+    if classifier is None or not classifier.ready or not tasks:
+        return tasks
+    return apply_classifier(tasks, classifier)
+
+
+def _done_flags(previous_tasks):
+    return {task["task"]: True for task in previous_tasks or [] if task.get("done")}
+
+
+def _carry_done(task, done_by_text):
+    task = {k: v for k, v in task.items() if k not in ("schedule", "done")}
+    task["done"] = done_by_text.get(task["task"], False)
+    return task
+
+
+_END = object()
+
+
+def _stream_segment(segment, out):
+    try:
+        for task in iter_plan_tasks(segment):
+            out.put(task)
+        out.put(_END)
+    except Exception as exc:
+        out.put(exc)
+
+
+def iter_extract_incremental(
+    transcript, previous_tasks=None, cache=segment_cache, max_workers=MAX_WORKERS, classifier=None
+):
+    """Yield tasks in transcript order while changed segments stream in.
+
+    Changed segments are streamed concurrently with `iter_plan_tasks`; a segment's
+    tasks are yielded once every segment before it is finished, and each finished
+    segment is cached like in `extract_incremental`, so a later edit re-sends only
+    what changed. A ready `classifier` relabels tasks as they are yielded.
+    """
+    segments = split_segments(transcript)
+    keys = [segment_key(segment) for segment in segments]
+    results = {}
+    streams = {}
+    done_by_text = _done_flags(previous_tasks)
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for key, segment in zip(keys, segments):
+            if key in results or key in streams:
+                continue
+            cached = cache.get(key)
+            if cached is None:
+                streams[key] = queue.Queue()
+                pool.submit(_stream_segment, segment, streams[key])
+            else:
+                results[key] = cached
+        for key in keys:
+            if key in results:
+                for task in results[key]:
+                    yield from _relabel([_carry_done(task, done_by_text)], classifier)
+                continue
+            tasks = []
+            while True:
+                item = streams[key].get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                tasks.append(item)
+                yield from _relabel([_carry_done(item, done_by_text)], classifier)
+            cache.set(key, tasks)
+            results[key] = tasks
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
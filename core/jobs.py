@@ -0,0 +1,125 @@
+"""Background transcription and extraction jobs.
+
+Jobs are rows in the `job` table, so they outlive the Streamlit session that
+queued them. An in-process pool of `JOB_WORKERS` threads runs them. Running
+jobs send a heartbeat every `JOB_HEARTBEAT_SECONDS`; the app creates the queue
+at startup, and from then on queued jobs and running jobs whose heartbeat is
+older than `JOB_STALE_SECONDS` (their process died) are picked up again.
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.ai_processing import transcribe_note
+from core.incremental import extract_incremental
+from core.local_classifier import classifier_for_user
+from core.scheduling import schedule_tasks
+from core.storage import claim_job, create_job, finish_job, heartbeat_jobs, requeue_stale_jobs
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "3"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "60"))
+
+logger = logging.getLogger(__name__)
+
+
+def _transcribe(job, payload):
+    return {"transcript": transcribe_note(job.audio, payload["mime_type"])}
+
+
+def _extract(job, payload):
+    classifier = classifier_for_user(job.user_id) if payload.get("fast_path") else None
+    tasks, stats = extract_incremental(payload["transcript"], payload.get("previous_tasks"), classifier=classifier)
+    schedule_tasks(tasks)
+    return {"tasks": tasks, "stats": stats}
+
+
+HANDLERS = {"transcribe": _transcribe, "extract": _extract}
+
+
+class JobQueue:
+    def __init__(self, max_workers=JOB_WORKERS, heartbeat_seconds=JOB_HEARTBEAT_SECONDS, stale_seconds=JOB_STALE_SECONDS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="planner-job")
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self._submitted = set()
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def _submit(self, job_id):
+        with self._lock:
+            if job_id in self._submitted:
+                return
+            self._submitted.add(job_id)
+        self._pool.submit(self.run, job_id)
+
+    def submit_transcribe(self, user_id, audio_bytes, mime_type, label=""):
+        job_id = create_job(user_id, "transcribe", {"mime_type": mime_type}, label=label, audio=audio_bytes)
+        self._submit(job_id)
+        return job_id
+
+    def submit_extract(self, user_id, transcript, previous_tasks=None, fast_path=True, label=""):
+        payload = {"transcript": transcript, "previous_tasks": previous_tasks or [], "fast_path": fast_path}
+        job_id = create_job(user_id, "extract", payload, label=label)
+        self._submit(job_id)
+        return job_id
+
+    def resume(self):
+        """Requeue jobs whose worker stopped sending heartbeats and submit every queued job."""
+        job_ids = requeue_stale_jobs(self.stale_seconds)
+        for job_id in job_ids:
+            self._submit(job_id)
+        return job_ids
+
+    def start_monitor(self):
+        """Send heartbeats for this process's running jobs and sweep for stale ones, from a daemon thread."""
+        threading.Thread(target=self._monitor, name="planner-job-monitor", daemon=True).start()
+
+    def stop_monitor(self):
+        self._stopped.set()
+
+    def _monitor(self):
+        while not self._stopped.wait(self.heartbeat_seconds):
+            try:
+                with self._lock:
+                    running = list(self._running)
+                heartbeat_jobs(running)
+                self.resume()
+            except Exception:
+                logger.exception("Job heartbeat failed")
+
+    def run(self, job_id):
+        try:
+            job = claim_job(job_id)
+            if job is None:
+                return
+            with self._lock:
+                self._running.add(job_id)
+            try:
+                result = HANDLERS[job.kind](job, json.loads(job.payload))
+            except Exception as exc:
+                finish_job(job_id, error=str(exc) or type(exc).__name__)
+            else:
+                finish_job(job_id, result=result)
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+                self._submitted.discard(job_id)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Process-wide queue; the first call also resumes unfinished jobs and starts the heartbeat monitor."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+            _queue.resume()
+            _queue.start_monitor()
+        return _queue
@@ -0,0 +1,151 @@
+"""Per-user fast-path labelling for repetitive tasks.
+
+A multinomial naive Bayes model over word unigrams and bigrams is trained on the
+tasks in a user's saved plans. On the fused path its confident labels replace
+the ones Gemini returned, so familiar tasks keep the labels the user saved. On
+the three-call path, tasks it labels with enough confidence skip the matching
+Gemini stage and only the uncertain ones go to `categorize_and_prioritize` or
+`classify_cognitive_load`.
+"""
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+from core.storage import labelled_tasks, latest_task_id
+
+CONFIDENCE_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.9"))
+MIN_TRAINING_TASKS = int(os.getenv("LOCAL_CLASSIFIER_MIN_TASKS", "30"))
+MIN_KNOWN_FEATURES = 0.5
+FIELDS = ("category", "priority", "type")
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def _words(text):
+    return _WORD.findall(text.lower())
+
+
+def features(text):
+    words = _words(text)
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class _NaiveBayes:
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+        self.label_counts = Counter()
+        self.feature_counts = defaultdict(Counter)
+        self.feature_totals = Counter()
+        self.vocabulary = set()
+
+    def add(self, feats, label):
+        self.label_counts[label] += 1
+        self.feature_counts[label].update(feats)
+        self.feature_totals[label] += len(feats)
+        self.vocabulary.update(feats)
+
+    def predict(self, feats):
+        total = sum(self.label_counts.values())
+        vocab = len(self.vocabulary) or 1
+        scores = {}
+        for label, count in self.label_counts.items():
+            counts = self.feature_counts[label]
+            denominator = math.log(self.feature_totals[label] + self.alpha * vocab)
+            score = math.log(count / total)
+            for feat in feats:
+                score += math.log(counts.get(feat, 0) + self.alpha) - denominator
+            scores[label] = score
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        normalizer = sum(math.exp(score - top) for score in scores.values())
+        return best, 1.0 / normalizer
+
+
+class LocalClassifier:
+    def __init__(self, threshold=CONFIDENCE_THRESHOLD, min_training_tasks=MIN_TRAINING_TASKS):
+        self.threshold = threshold
+        self.min_training_tasks = min_training_tasks
+        self.models = {field: _NaiveBayes() for field in FIELDS}
+        self.trained_on = 0
+        # Exact task text -> labels, or None once the user has labelled it inconsistently.
+        self.memory = {}
+        self.stats = {"tasks": 0, "fast_labelled": 0, "llm_calls_avoided": 0, "tasks_sent_to_llm": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.trained_on >= self.min_training_tasks
+
+    def fit(self, rows):
+        """Train on (task, category, priority, type) tuples."""
+        for task, category, priority, task_type in rows:
+            feats = features(task)
+            if not feats:
+                continue
+            labels = (category, priority, task_type)
+            for field, label in zip(FIELDS, labels):
+                self.models[field].add(feats, label)
+            key = " ".join(_words(task))
+            self.memory[key] = labels if self.memory.get(key, labels) == labels else None
+            self.trained_on += 1
+        return self
+
+    def predict(self, task):
+        """Return {field: label} for the fields predicted above the threshold.
+
+        A task the user has saved before with consistent labels reuses them outright.
+        """
+        if not self.ready:
+            return {}
+        feats = features(task)
+        remembered = self.memory.get(" ".join(_words(task)))
+        if remembered is not None:
+            return dict(zip(FIELDS, remembered))
+        vocabulary = self.models["category"].vocabulary
+        if not feats or sum(f in vocabulary for f in feats) / len(feats) < MIN_KNOWN_FEATURES:
+            return {}
+        confident = {}
+        for field in FIELDS:
+            label, probability = self.models[field].predict(feats)
+            if probability >= self.threshold:
+                confident[field] = label
+        return confident
+
+    def record(self, tasks, fast_labelled, sent_to_llm, calls_avoided):
+        with self._lock:
+            self.stats["tasks"] += tasks
+            self.stats["fast_labelled"] += fast_labelled
+            self.stats["tasks_sent_to_llm"] += sent_to_llm
+            self.stats["llm_calls_avoided"] += calls_avoided
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["trained_on"] = self.trained_on
+        stats["threshold"] = self.threshold
+        return stats
+
+
+_classifiers = {}
+_registry_lock = threading.Lock()
+
+
+def classifier_for_user(user_id):
+    """Per-user classifier, retrained when the user has saved new tasks since the last fit."""
+    version = latest_task_id(user_id)
+    with _registry_lock:
+        cached = _classifiers.get(user_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    classifier = LocalClassifier().fit(labelled_tasks(user_id))
+    with _registry_lock:
+        previous = _classifiers.get(user_id)
+        if previous is not None:
+            # Keep the running fast-path metrics across retrains.
+            classifier.stats = previous[1].snapshot()
+            classifier.stats.pop("trained_on", None)
+            classifier.stats.pop("threshold", None)
+        _classifiers[user_id] = (version, classifier)
+    return classifier
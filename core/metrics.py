@@ -0,0 +1,266 @@
+"""In-process metrics for the planner's hot paths.
+
+Stage timings, Gemini call sizes, token counts and retries, and SQL statement
+timings are kept in a process-wide registry. `render_prometheus()` exports it in
+the Prometheus text format, and `start_metrics_server()` serves that on
+`/metrics`. Statements slower than `METRICS_SLOW_QUERY_MS` are logged and kept
+for the debug panel.
+"""
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import event
+
+SLOW_QUERY_MS = float(os.getenv("METRICS_SLOW_QUERY_MS", "100"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+SLOW_QUERY_HISTORY = 50
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger("planner.sql")
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+        self.slow_queries = deque(maxlen=SLOW_QUERY_HISTORY)
+
+    def inc(self, name, labels=None, value=1, help=""):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.help.setdefault(name, help)
+
+    def observe(self, name, value, labels=None, help=""):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = _Histogram()
+            histogram.observe(value)
+            self.help.setdefault(name, help)
+
+    def record_slow_query(self, seconds, statement):
+        with self._lock:
+            self.slow_queries.append((time.time(), seconds, statement))
+
+    def recent_slow_queries(self):
+        """Snapshot of the slow-query history, oldest first, safe to iterate while queries run."""
+        with self._lock:
+            return list(self.slow_queries)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.slow_queries.clear()
+
+    def stage_summary(self):
+        """[(stage, count, avg_ms, max_ms)] for the debug panel, slowest total first."""
+        with self._lock:
+            rows = [
+                (dict(labels)["stage"], h.count, h.sum / h.count * 1000, h.max * 1000, h.sum)
+                for (name, labels), h in self.histograms.items()
+                if name == "planner_stage_seconds" and h.count
+            ]
+        rows.sort(key=lambda row: row[4], reverse=True)
+        return [row[:4] for row in rows]
+
+
+registry = Registry()
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus(reg=registry, gauges=None):
+    """Prometheus text exposition of `reg`, plus optional {name: value} gauges."""
+    lines = []
+    with reg._lock:
+        counters = sorted(reg.counters.items())
+        histograms = sorted(reg.histograms.items(), key=lambda item: item[0])
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {reg.help.get(name, '')}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {reg.help.get(name, '')}")
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registry.inc("planner_stage_errors_total", {"stage": name}, help="Stage calls that raised.")
+        raise
+    finally:
+        registry.observe(
+            "planner_stage_seconds", time.perf_counter() - start, {"stage": name}, help="Wall time per pipeline stage."
+        )
+
+
+def timed(name):
+    """Decorator form of `stage`."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _payload_bytes(parts):
+    if isinstance(parts, (str, bytes)):
+        parts = [parts]
+    size = 0
+    for part in parts:
+        if isinstance(part, str):
+            size += len(part.encode())
+        elif isinstance(part, dict) and "data" in part:
+            size += len(part["data"])
+    return size
+
+
+def record_model_call(model_name, parts, response_text, seconds, retries=0, usage=None, streamed=False):
+    labels = {"model": model_name}
+    registry.observe("gemini_call_seconds", seconds, labels, help="Gemini request latency, including retries.")
+    registry.inc("gemini_calls_total", dict(labels, mode="stream" if streamed else "unary"), help="Gemini requests.")
+    registry.inc("gemini_retries_total", labels, retries, help="Quota retries before a Gemini request succeeded.")
+    registry.inc("gemini_prompt_bytes_total", labels, _payload_bytes(parts), help="Bytes of prompt text and audio sent.")
+    registry.inc(
+        "gemini_response_bytes_total", labels, len((response_text or "").encode()), help="Bytes of response text."
+    )
+    for field, direction in (("prompt_token_count", "prompt"), ("candidates_token_count", "response")):
+        tokens = getattr(usage, field, None)
+        if tokens:
+            registry.inc(
+                "gemini_tokens_total", dict(labels, direction=direction), tokens, help="Tokens reported by usage_metadata."
+            )
+
+
+def record_cache(hit):
+    registry.inc("gemini_cache_lookups_total", {"result": "hit" if hit else "miss"}, help="Response cache lookups.")
+
+
+def _statement_kind(statement):
+    return (statement.lstrip().split(None, 1) or ["?"])[0].upper()
+
+
+def install_query_logging(engine, threshold_ms=SLOW_QUERY_MS):
+    """Time every statement on `engine`; log and keep the ones slower than `threshold_ms`."""
+
+    # The start time lives on the execution context, which is discarded with the
+    # statement, so a statement that raises leaves nothing behind.
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+        else:
+            conn.info["query_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            start = getattr(context, "_query_start", None)
+        else:
+            start = conn.info.pop("query_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        kind = _statement_kind(statement)
+        registry.observe("db_statement_seconds", elapsed, {"kind": kind}, help="SQL statement execution time.")
+        if elapsed * 1000 >= threshold_ms:
+            registry.inc("db_slow_statements_total", {"kind": kind}, help="Statements over the slow-query threshold.")
+            registry.record_slow_query(elapsed, " ".join(statement.split())[:300])
+            logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split())[:300])
+
+    return engine
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, gauges=None, host=METRICS_HOST):
+    """Serve `render_prometheus()` on http://<host>:<port>/metrics from a daemon thread (once per process).
+
+    `host` defaults to loopback; set `METRICS_HOST=0.0.0.0` to let a remote scraper in.
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_prometheus(gauges=gauges() if gauges else None).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        _server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
@@ -0,0 +1,152 @@
+import os
+import random
+import threading
+import time
+
+
+class AdaptiveRateLimiter:
+    """Process-wide token bucket with AIMD concurrency and jittered retry on throttling.
+
+    Callers block in `acquire` until both a request token and a concurrency slot are
+    free, so bursts queue instead of failing. A throttled call halves the concurrency
+    limit and is retried with full-jitter exponential backoff; successes grow the
+    limit back one slot at a time.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute=60,
+        burst=None,
+        max_concurrency=8,
+        max_retries=5,
+        backoff_base=1.0,
+        backoff_max=30.0,
+    ):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, min(requests_per_minute, max_concurrency)))
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._limit = max_concurrency
+        self._in_flight = 0
+        self._waiting = 0
+        self._successes_since_change = 0
+        self._cond = threading.Condition()
+        self.stats = {"calls": 0, "throttled": 0, "retries": 0, "failures": 0, "wait_seconds": 0.0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            requests_per_minute=int(os.getenv("GEMINI_RPM", "60")),
+            max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+            max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "5")),
+            backoff_base=float(os.getenv("GEMINI_BACKOFF_BASE", "1.0")),
+            backoff_max=float(os.getenv("GEMINI_BACKOFF_MAX", "30.0")),
+        )
+
+    def configure(self, requests_per_minute=None, max_concurrency=None, max_retries=None, backoff_base=None):
+        with self._cond:
+            if requests_per_minute is not None:
+                self.rate = requests_per_minute / 60.0
+                self.capacity = float(max(1, min(requests_per_minute, max_concurrency or self.max_concurrency)))
+                self._tokens = min(self._tokens, self.capacity)
+            if max_concurrency is not None:
+                self.max_concurrency = max_concurrency
+                self._limit = max_concurrency
+            if max_retries is not None:
+                self.max_retries = max_retries
+            if backoff_base is not None:
+                self.backoff_base = backoff_base
+            self._cond.notify_all()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        start = time.monotonic()
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._in_flight < self._limit and self._tokens >= 1:
+                        self._tokens -= 1
+                        self._in_flight += 1
+                        break
+                    if self._in_flight >= self._limit:
+                        self._cond.wait()
+                    else:
+                        self._cond.wait((1 - self._tokens) / self.rate)
+            finally:
+                self._waiting -= 1
+            self.stats["wait_seconds"] += time.monotonic() - start
+
+    def release(self, throttled=False, succeeded=True):
+        """Free a slot; throttles shrink the limit, successes grow it, other failures leave it alone."""
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self._limit = max(1, self._limit // 2)
+                self._successes_since_change = 0
+            elif succeeded:
+                self._successes_since_change += 1
+                if self._limit < self.max_concurrency and self._successes_since_change >= self._limit:
+                    self._limit += 1
+                    self._successes_since_change = 0
+            self._cond.notify_all()
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def run(self, fn, retry_on=(), hold=False):
+        """Call `fn` under the limiter, retrying `retry_on` exceptions with backoff.
+
+        With `hold`, a successful call keeps its concurrency slot and the caller must
+        `release()` it, e.g. once a streamed response has been read to the end.
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = fn()
+            except retry_on:
+                self.release(throttled=True)
+                with self._cond:
+                    self.stats["throttled"] += 1
+                    if attempt >= self.max_retries:
+                        self.stats["failures"] += 1
+                        raise
+                    self.stats["retries"] += 1
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                self.release(succeeded=False)
+                raise
+            if not hold:
+                self.release()
+            with self._cond:
+                self.stats["calls"] += 1
+            return result
+
+    def state(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            state = dict(self.stats)
+            state.update(
+                tokens=round(self._tokens, 2),
+                capacity=self.capacity,
+                requests_per_minute=self.rate * 60,
+                concurrency_limit=self._limit,
+                in_flight=self._in_flight,
+                queue_depth=self._waiting,
+            )
+        return state
+
+
+gemini_limiter = AdaptiveRateLimiter.from_env()
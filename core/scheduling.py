@@ -6,6 +6,14 @@ def schedule_task(priority):
     else:
         return "Later"
 
+def schedule_tasks(tasks):
+    scheduled = {"Today": [], "Tomorrow": [], "Later": []}
+    for task in tasks:
+        task["schedule"] = schedule_task(task["priority"])
+        task.setdefault("done", False)
+        scheduled[task["schedule"]].append(task)
+    return scheduled
+
 def create_focus_blocks(tasks):
     deep = [t for t in tasks if t.get("type") == "Deep Task"]
     micro = [t for t in tasks if t.get("type") == "Micro Task"]
@@ -1,20 +1,75 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional, List
 import os
 import hashlib
+import logging
+import re
+import threading
 
-from sqlmodel import SQLModel, Field, create_engine, Session, select
+from sqlmodel import SQLModel, Field, create_engine, Session, select, delete, func
 import json
+from sqlalchemy import Index, Integer, UniqueConstraint, case, cast, event, insert, inspect, text, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.exc import IntegrityError
 
+from core.metrics import install_query_logging, timed
+
 DB_URL = os.getenv("DB_URL", "sqlite:///planner.db")
-engine = create_engine(DB_URL, echo=False, connect_args={"check_same_thread": False})
+TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_ENTRIES", "1000"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", "20000"))
+
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    """Per-connection pragmas: WAL lets readers run alongside the single writer."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KIB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def _create_engine(url: str):
+    if not url.startswith("sqlite"):
+        return create_engine(
+            url,
+            echo=False,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_pre_ping=True,
+        )
+    connect_args = {"check_same_thread": False, "timeout": DB_BUSY_TIMEOUT_MS / 1000}
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # One shared connection, otherwise every pooled connection sees its own empty database.
+        return create_engine(url, echo=False, connect_args=connect_args, poolclass=StaticPool)
+    sqlite_engine = create_engine(
+        url,
+        echo=False,
+        connect_args=connect_args,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+    )
+    event.listen(sqlite_engine, "connect", _configure_sqlite)
+    return sqlite_engine
 
-# Streamlit reloads can keep old metadata around; clear to avoid duplicate table errors.
-SQLModel.metadata.clear()
+
+engine = install_query_logging(_create_engine(DB_URL))
+logger = logging.getLogger(__name__)
+
+# Streamlit re-executes this module when the source changes; extend_existing lets the
+# models re-register against the tables already in SQLModel.metadata.
+REDEFINE = {"extend_existing": True}
+SCHEMA_VERSION = 4
 
 
 class UserAccount(SQLModel, table=True):
+    __table_args__ = REDEFINE
+
     id: Optional[int] = Field(default=None, primary_key=True)
     username: str = Field(unique=True, index=True)
     password_hash: str
@@ -22,35 +77,222 @@ class UserAccount(SQLModel, table=True):
 
 
 class Plan(SQLModel, table=True):
+    __table_args__ = (Index("ix_plan_user_created", "user_id", "created_at"), REDEFINE)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="useraccount.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     title: str
     transcript: str
-    tasks_json: str
-    prioritized_json: str
-    schedule_json: str
-    blocks_json: str
+    # Legacy JSON copies of the plan; new plans store their tasks in PlanTask rows.
+    tasks_json: str = ""
+    prioritized_json: str = ""
+    schedule_json: str = ""
+    blocks_json: str = ""
+
+
+class PlanTask(SQLModel, table=True):
+    __table_args__ = (Index("ix_plantask_plan_position", "plan_id", "position"), REDEFINE)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    plan_id: int = Field(foreign_key="plan.id")
+    user_id: int = Field(index=True)
+    position: int
+    task: str
+    category: str = "Other"
+    priority: str = "Not Urgent & Not Important"
+    task_type: str = "Other"
+    schedule: str = "Later"
+    block_index: Optional[int] = None
+    done: bool = False
+
+
+class Transcription(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("audio_hash", "mime_type", "prompt_hash"), REDEFINE)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    audio_hash: str = Field(index=True)
+    mime_type: str
+    prompt_hash: str
+    text: str
+    size_bytes: int
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class Job(SQLModel, table=True):
+    __table_args__ = (Index("ix_job_user_created", "user_id", "created_at"), Index("ix_job_status", "status"), REDEFINE)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int
+    kind: str
+    label: str = ""
+    status: str = "queued"
+    payload: str = "{}"
+    audio: Optional[bytes] = None
+    result: str = ""
+    error: str = ""
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class TaskStat(SQLModel, table=True):
+    """Per-user daily task counts by category and priority, kept current by save_plan."""
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", "category", "priority", name="uq_taskstat_bucket"),
+        Index("ix_taskstat_user_day", "user_id", "day"),
+        REDEFINE,
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int
+    day: date
+    category: str
+    priority: str
+    total: int = 0
+    done: int = 0
+    deep: int = 0
+    micro: int = 0
+
+
+class SchemaVersion(SQLModel, table=True):
+    __table_args__ = REDEFINE
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    version: int
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def _stored_schema_version() -> int:
+    if not inspect(engine).has_table(SchemaVersion.__tablename__):
+        return 0
+    with get_session() as session:
+        return session.exec(select(func.max(SchemaVersion.version))).one() or 0
 
 
 def init_db():
-    SQLModel.metadata.create_all(engine)
-    _run_migrations()
+    """Create tables and run migrations once per process, and only when the stored
+    schema version is behind SCHEMA_VERSION."""
+    global _initialized, _search_available
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        if _stored_schema_version() < SCHEMA_VERSION:
+            SQLModel.metadata.create_all(engine)
+            _run_migrations()
+            with get_session() as session:
+                session.add(SchemaVersion(version=SCHEMA_VERSION))
+                session.commit()
+        elif _search_available:
+            _search_available = inspect(engine).has_table("plan_search")
+        _initialized = True
 
 
 def _run_migrations():
-    """Lightweight, in-app migrations to keep SQLite schema aligned."""
+    """Lightweight, in-app migrations to keep the schema aligned on any backend."""
     with engine.begin() as conn:
-        columns = conn.exec_driver_sql("PRAGMA table_info('plan')").fetchall()
-        column_names = {col[1] for col in columns}
+        inspector = inspect(conn)
+        column_names = {column["name"] for column in inspector.get_columns("plan")}
         if "user_id" not in column_names:
             conn.exec_driver_sql('ALTER TABLE "plan" ADD COLUMN user_id INTEGER')
             conn.exec_driver_sql('UPDATE "plan" SET user_id = 1 WHERE user_id IS NULL')
-        user_columns = conn.exec_driver_sql("PRAGMA table_info('useraccount')").fetchall()
-        user_column_names = {col[1] for col in user_columns}
+        user_column_names = {column["name"] for column in inspector.get_columns("useraccount")}
         if "created_at" not in user_column_names:
             conn.exec_driver_sql('ALTER TABLE "useraccount" ADD COLUMN created_at TIMESTAMP')
             conn.exec_driver_sql('UPDATE "useraccount" SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL')
+        if "heartbeat_at" not in {column["name"] for column in inspector.get_columns("job")}:
+            conn.exec_driver_sql("ALTER TABLE job ADD COLUMN heartbeat_at TIMESTAMP")
+        conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_plan_user_created ON "plan" (user_id, created_at)')
+    _migrate_plan_json()
+    _backfill_search_index()
+    with get_session() as session:
+        has_stats = session.exec(select(TaskStat.id).limit(1)).first() is not None
+    if not has_stats:
+        rebuild_task_stats()
+
+
+def _legacy_plan_body(plan: "Plan") -> tuple:
+    """Decode a legacy plan's JSON columns into (tasks, schedule, blocks); ValueError if corrupted."""
+    try:
+        tasks = json.loads(plan.tasks_json)
+        schedule = json.loads(plan.schedule_json)
+        blocks = json.loads(plan.blocks_json)
+    except ValueError as exc:
+        raise ValueError("Saved plan is corrupted") from exc
+    if not isinstance(tasks, list) or not isinstance(schedule, dict) or not isinstance(blocks, list):
+        raise ValueError("Saved plan is corrupted")
+    if not all(isinstance(item, dict) for item in tasks + blocks):
+        raise ValueError("Saved plan is corrupted")
+    return tasks, schedule, blocks
+
+
+def _migrate_plan_json():
+    """Move tasks from the legacy JSON columns into PlanTask rows, one plan per transaction."""
+    with get_session() as session:
+        plan_ids = list(session.exec(select(Plan.id).where(Plan.tasks_json != "")))
+    for plan_id in plan_ids:
+        with get_session() as session:
+            plan = session.get(Plan, plan_id)
+            try:
+                rows = _task_rows(plan.id, plan.user_id, *_legacy_plan_body(plan))
+            except (ValueError, TypeError, AttributeError) as exc:
+                # Leave corrupted plans untouched; load_plan reports them to the user.
+                logger.warning("Skipping migration of corrupted plan %s: %s", plan_id, exc)
+                continue
+            session.add_all(rows)
+            plan.tasks_json = plan.prioritized_json = plan.schedule_json = plan.blocks_json = ""
+            session.add(plan)
+            session.commit()
+
+
+_search_available = engine.dialect.name == "sqlite"
+
+
+def _backfill_search_index():
+    """Create the FTS5 plan index if needed and add any plans it is missing."""
+    global _search_available
+    if not _search_available:
+        return
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS plan_search "
+                "USING fts5(title, transcript, tasks, tokenize='porter unicode61')"
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO plan_search (rowid, title, transcript, tasks) "
+                "SELECT p.id, p.title, p.transcript, "
+                "COALESCE((SELECT group_concat(t.task, char(10)) FROM plantask t WHERE t.plan_id = p.id), '') "
+                'FROM "plan" p WHERE p.id NOT IN (SELECT rowid FROM plan_search)'
+            )
+    except OperationalError:
+        # SQLite built without FTS5; search_plans falls back to LIKE queries.
+        _search_available = False
+
+
+def _index_plan(session: Session, plan: "Plan", tasks: list) -> None:
+    if not _search_available:
+        return
+    session.exec(
+        text(
+            "INSERT INTO plan_search (rowid, title, transcript, tasks) "
+            "VALUES (:id, :title, :transcript, :tasks)"
+        ).bindparams(
+            id=plan.id,
+            title=plan.title,
+            transcript=plan.transcript,
+            tasks="\n".join(task.get("task", "") for task in tasks),
+        )
+    )
 
 
 def get_session():
@@ -84,6 +326,7 @@ def authenticate_user(username: str, password: str) -> Optional[dict]:
         return None
 
 
+@timed("save_plan")
 def save_plan(
     user_id: int,
     title: Optional[str],
@@ -93,20 +336,22 @@ def save_plan(
     schedule: dict,
     blocks: dict,
 ) -> Plan:
+    # `prioritized` is the same task list as `tasks` in every caller; it is kept for
+    # signature compatibility and not stored separately.
     if not title:
         title = datetime.utcnow().strftime("Plan %Y-%m-%d %H:%M")
-    plan = Plan(
-        user_id=user_id,
-        title=title,
-        transcript=transcript or "",
-        tasks_json=json.dumps(tasks),
-        prioritized_json=json.dumps(prioritized),
-        schedule_json=json.dumps(schedule),
-        blocks_json=json.dumps(blocks),
-    )
+    plan = Plan(user_id=user_id, title=title, transcript=transcript or "")
     with get_session() as session:
         try:
             session.add(plan)
+            session.flush()
+            rows = _task_rows(plan.id, user_id, tasks, schedule, blocks)
+            session.add_all(rows)
+            _add_task_stats(
+                session,
+                ((user_id, plan.created_at.date(), r.category, r.priority, r.task_type, r.done) for r in rows),
+            )
+            _index_plan(session, plan, tasks)
             session.commit()
             session.refresh(plan)
             return plan
@@ -115,6 +360,355 @@ def save_plan(
             raise RuntimeError(f"Failed to save plan: {exc}") from exc
 
 
+def _membership(groups):
+    """Map each grouped task to its group, by object identity and by task text."""
+    by_id, by_text = {}, {}
+    for key, items in groups:
+        for item in items:
+            by_id[id(item)] = key
+            by_text.setdefault(item.get("task"), []).append(key)
+    return by_id, by_text
+
+
+def _group_of(task, by_id, by_text):
+    key = by_id.get(id(task))
+    if key is None:
+        keys = by_text.get(task.get("task"))
+        if keys:
+            key = keys.pop(0)
+    return key
+
+
+def _task_rows(plan_id: int, user_id: int, tasks: list, schedule: dict, blocks: list) -> List[PlanTask]:
+    schedule_by_id, schedule_by_text = _membership(schedule.items())
+    block_by_id, block_by_text = _membership((i, block.get("tasks", [])) for i, block in enumerate(blocks))
+    rows = []
+    for position, task in enumerate(tasks):
+        rows.append(
+            PlanTask(
+                plan_id=plan_id,
+                user_id=user_id,
+                position=position,
+                task=task.get("task", ""),
+                category=task.get("category") or "Other",
+                priority=task.get("priority") or "Not Urgent & Not Important",
+                task_type=task.get("type") or "Other",
+                schedule=task.get("schedule") or _group_of(task, schedule_by_id, schedule_by_text) or "Later",
+                block_index=_group_of(task, block_by_id, block_by_text),
+                done=bool(task.get("done", False)),
+            )
+        )
+    return rows
+
+
+BLOCK_TYPES = {"Deep Task": "Deep Task", "Micro Task": "Micro Tasks"}
+
+
+def _rebuild_plan(rows: List[PlanTask]) -> tuple:
+    """Rebuild (tasks, schedule, blocks) from PlanTask rows; buckets and blocks share the task dicts."""
+    tasks = []
+    schedule = {"Today": [], "Tomorrow": [], "Later": []}
+    blocks = {}
+    for row in rows:
+        task = {
+            "task": row.task,
+            "category": row.category,
+            "priority": row.priority,
+            "type": row.task_type,
+            "schedule": row.schedule,
+            "done": row.done,
+        }
+        tasks.append(task)
+        schedule.setdefault(row.schedule, []).append(task)
+        if row.block_index is not None:
+            block = blocks.setdefault(row.block_index, {"type": BLOCK_TYPES.get(row.task_type, "Other"), "tasks": []})
+            block["tasks"].append(task)
+    return tasks, schedule, [blocks[i] for i in sorted(blocks)]
+
+
+@timed("load_plan")
+def load_plan(plan_id: int, user_id: Optional[int] = None) -> Optional[dict]:
+    """Load one plan with its tasks, schedule buckets and focus blocks.
+
+    Raises ValueError when a legacy JSON plan cannot be decoded.
+    """
+    with get_session() as session:
+        plan = session.get(Plan, plan_id)
+        if plan is None or (user_id is not None and plan.user_id != user_id):
+            return None
+        if plan.tasks_json:
+            tasks, schedule, blocks = _legacy_plan_body(plan)
+        else:
+            statement = select(PlanTask).where(PlanTask.plan_id == plan_id).order_by(PlanTask.position)
+            tasks, schedule, blocks = _rebuild_plan(list(session.exec(statement)))
+        return {
+            "id": plan.id,
+            "title": plan.title,
+            "created_at": plan.created_at,
+            "transcript": plan.transcript,
+            "tasks": tasks,
+            "schedule": schedule,
+            "blocks": blocks,
+        }
+
+
+@timed("list_plan_summaries")
+def list_plan_summaries(user_id: int, limit: int = 5, before: Optional[tuple] = None) -> List[dict]:
+    """Newest-first plan headers (id, title, created_at) without loading plan bodies.
+
+    Pass the `(created_at, id)` of the last summary on a page as `before` to fetch
+    the next page; the keyset condition walks the (user_id, created_at) index
+    instead of scanning past an OFFSET.
+    """
+    statement = select(Plan.id, Plan.title, Plan.created_at).where(Plan.user_id == user_id)
+    if before is not None:
+        created_at, plan_id = before
+        statement = statement.where(
+            (Plan.created_at < created_at) | ((Plan.created_at == created_at) & (Plan.id < plan_id))
+        )
+    statement = statement.order_by(Plan.created_at.desc(), Plan.id.desc()).limit(limit)
+    with get_session() as session:
+        try:
+            return [{"id": row[0], "title": row[1], "created_at": row[2]} for row in session.exec(statement)]
+        except Exception as exc:
+            raise RuntimeError(f"Failed to load plans: {exc}") from exc
+
+
+def _match_expression(query: str) -> Optional[str]:
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    # Quote every term so user input can't inject FTS syntax; prefix-match each one.
+    return " AND ".join(f'"{term}"*' for term in terms)
+
+
+@timed("search_plans")
+def search_plans(user_id: int, query: str, limit: int = 20) -> List[dict]:
+    """Best-matching plans for `query` across titles, transcripts and task text.
+
+    Uses the FTS5 index (bm25 ranking) on SQLite, and plain LIKE matching elsewhere.
+    """
+    match = _match_expression(query)
+    if match is None:
+        return []
+    with get_session() as session:
+        try:
+            if _search_available:
+                rows = session.exec(
+                    text(
+                        "SELECT p.id, p.title, p.created_at, "
+                        "snippet(plan_search, -1, '[', ']', '…', 10) "
+                        'FROM plan_search JOIN "plan" p ON p.id = plan_search.rowid '
+                        "WHERE plan_search MATCH :match AND p.user_id = :user_id "
+                        "ORDER BY bm25(plan_search) LIMIT :limit"
+                    ).bindparams(match=match, user_id=user_id, limit=limit)
+                ).all()
+                return [
+                    {"id": row[0], "title": row[1], "created_at": _as_datetime(row[2]), "snippet": row[3]}
+                    for row in rows
+                ]
+            pattern = f"%{query.strip()}%"
+            statement = (
+                select(Plan.id, Plan.title, Plan.created_at)
+                .where(Plan.user_id == user_id)
+                .where(
+                    Plan.title.ilike(pattern)
+                    | Plan.transcript.ilike(pattern)
+                    | Plan.id.in_(select(PlanTask.plan_id).where(PlanTask.task.ilike(pattern)))
+                )
+                .order_by(Plan.created_at.desc())
+                .limit(limit)
+            )
+            return [
+                {"id": row[0], "title": row[1], "created_at": row[2], "snippet": ""}
+                for row in session.exec(statement)
+            ]
+        except Exception as exc:
+            raise RuntimeError(f"Failed to search plans: {exc}") from exc
+
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+
+def _export_task(row) -> dict:
+    return {
+        "task": row.task,
+        "category": row.category,
+        "priority": row.priority,
+        "type": row.task_type,
+        "schedule": row.schedule,
+        "block": row.block_index,
+        "done": row.done,
+    }
+
+
+def iter_plan_exports(user_id: int, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield a user's plans oldest first as JSON-ready dicts, holding one batch in memory.
+
+    Plans are read through a streaming cursor; each batch's tasks are loaded with a
+    single IN query. Plans whose legacy JSON could not be migrated are skipped.
+    """
+    statement = (
+        select(Plan.id, Plan.title, Plan.created_at, Plan.transcript)
+        .where(Plan.user_id == user_id, Plan.tasks_json == "")
+        .order_by(Plan.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    with get_session() as session:
+        for batch in session.exec(statement).partitions():
+            plan_ids = [row.id for row in batch]
+            tasks = {plan_id: [] for plan_id in plan_ids}
+            rows = session.exec(
+                select(PlanTask).where(PlanTask.plan_id.in_(plan_ids)).order_by(PlanTask.plan_id, PlanTask.position)
+            )
+            for row in rows:
+                tasks[row.plan_id].append(_export_task(row))
+            session.expunge_all()
+            for row in batch:
+                yield {
+                    "title": row.title,
+                    "created_at": _as_datetime(row.created_at).isoformat(),
+                    "transcript": row.transcript,
+                    "tasks": tasks[row.id],
+                }
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parse an ISO timestamp to the naive UTC datetimes the tables store."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+EXPORT_LABEL_FIELDS = ("category", "priority", "type", "schedule")
+
+
+def _validate_export(record) -> Optional[str]:
+    if not isinstance(record, dict):
+        return "record is not an object"
+    if not isinstance(record.get("title"), str) or not record["title"].strip():
+        return "missing title"
+    if not isinstance(record.get("transcript", ""), str):
+        return "transcript is not a string"
+    if record.get("created_at") is not None:
+        try:
+            _parse_timestamp(record["created_at"])
+        except (TypeError, ValueError):
+            return "created_at is not an ISO timestamp"
+    tasks = record.get("tasks", [])
+    if not isinstance(tasks, list):
+        return "tasks is not a list"
+    for task in tasks:
+        if not isinstance(task, dict) or not isinstance(task.get("task"), str) or not task["task"].strip():
+            return "task entries need a non-empty `task` string"
+        if task.get("block") is not None and (not isinstance(task["block"], int) or isinstance(task["block"], bool)):
+            return "task block is not an integer"
+        for field in EXPORT_LABEL_FIELDS:
+            if task.get(field) is not None and not isinstance(task[field], str):
+                return f"task {field} is not a string"
+        if task.get("done") is not None and not isinstance(task["done"], bool):
+            return "task done is not a boolean"
+    return None
+
+
+def _insert_batch(user_id: int, records: list) -> None:
+    with get_session() as session:
+        try:
+            plans = [
+                Plan(
+                    user_id=user_id,
+                    title=record["title"],
+                    transcript=record.get("transcript", ""),
+                    created_at=_parse_timestamp(record["created_at"]) if record.get("created_at") else datetime.utcnow(),
+                )
+                for record in records
+            ]
+            session.add_all(plans)
+            session.flush()
+            task_rows = [
+                {
+                    "plan_id": plan.id,
+                    "user_id": user_id,
+                    "position": position,
+                    "task": task["task"],
+                    "category": task.get("category") or "Other",
+                    "priority": task.get("priority") or "Not Urgent & Not Important",
+                    "task_type": task.get("type") or "Other",
+                    "schedule": task.get("schedule") or "Later",
+                    "block_index": task.get("block"),
+                    "done": bool(task.get("done", False)),
+                }
+                for plan, record in zip(plans, records)
+                for position, task in enumerate(record.get("tasks", []))
+            ]
+            if task_rows:
+                # Core executemany; ORM objects for every task would dominate import time.
+                session.execute(insert(PlanTask), task_rows)
+                days = {plan.id: plan.created_at.date() for plan in plans}
+                _add_task_stats(
+                    session,
+                    (
+                        (user_id, days[r["plan_id"]], r["category"], r["priority"], r["task_type"], r["done"])
+                        for r in task_rows
+                    ),
+                )
+            if _search_available:
+                session.execute(
+                    text(
+                        "INSERT INTO plan_search (rowid, title, transcript, tasks) "
+                        "VALUES (:id, :title, :transcript, :tasks)"
+                    ),
+                    [
+                        {
+                            "id": plan.id,
+                            "title": plan.title,
+                            "transcript": plan.transcript,
+                            "tasks": "\n".join(task["task"] for task in record.get("tasks", [])),
+                        }
+                        for plan, record in zip(plans, records)
+                    ],
+                )
+            session.commit()
+        except Exception as exc:
+            session.rollback()
+            raise RuntimeError(f"Failed to import plans: {exc}") from exc
+
+
+@timed("import_plans")
+def import_plans(user_id: int, records, batch_size: int = IMPORT_BATCH_SIZE, numbered: bool = False) -> dict:
+    """Insert exported plan records for `user_id`, one transaction per `batch_size` plans.
+
+    `records` may be any iterable, so a file can be streamed through. Invalid records
+    are skipped and reported as (index, reason) pairs in the returned stats; with
+    `numbered`, `records` yields (number, record) pairs, e.g. line numbers, and those
+    numbers are reported instead.
+    """
+    stats = {"imported": 0, "invalid": []}
+    batch = []
+    for index, record in records if numbered else enumerate(records):
+        error = _validate_export(record)
+        if error:
+            stats["invalid"].append((index, error))
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            _insert_batch(user_id, batch)
+            stats["imported"] += len(batch)
+            batch = []
+    if batch:
+        _insert_batch(user_id, batch)
+        stats["imported"] += len(batch)
+    return stats
+
+
+def _as_datetime(value):
+    # Raw SQL on SQLite returns timestamps as strings.
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+@timed("list_plans")
 def list_plans(user_id: int, limit: int = 5) -> List[Plan]:
     with get_session() as session:
         try:
@@ -122,3 +716,312 @@ def list_plans(user_id: int, limit: int = 5) -> List[Plan]:
             return list(session.exec(statement))
         except Exception as exc:
             raise RuntimeError(f"Failed to load plans: {exc}") from exc
+
+
+def latest_task_id(user_id: int) -> Optional[int]:
+    """Highest PlanTask id for the user; changes whenever the user saves a plan."""
+    with get_session() as session:
+        return session.exec(select(func.max(PlanTask.id)).where(PlanTask.user_id == user_id)).one()
+
+
+def labelled_tasks(user_id: int, limit: int = 5000) -> List[tuple]:
+    """(task, category, priority, task_type) for the user's most recently saved tasks."""
+    statement = (
+        select(PlanTask.task, PlanTask.category, PlanTask.priority, PlanTask.task_type)
+        .where(PlanTask.user_id == user_id)
+        .order_by(PlanTask.id.desc())
+        .limit(limit)
+    )
+    with get_session() as session:
+        return [tuple(row) for row in session.exec(statement)]
+
+
+STAT_KEY = ("user_id", "day", "category", "priority")
+STAT_COUNTS = ("total", "done", "deep", "micro")
+
+
+def _add_task_stats(session: Session, entries) -> None:
+    """Fold (user_id, day, category, priority, task_type, done) entries into TaskStat counters."""
+    counts = {}
+    for user_id, day, category, priority, task_type, done in entries:
+        bucket = counts.setdefault((user_id, day, category, priority), [0, 0, 0, 0])
+        bucket[0] += 1
+        bucket[1] += int(bool(done))
+        bucket[2] += task_type == "Deep Task"
+        bucket[3] += task_type == "Micro Task"
+    if not counts:
+        return
+    rows = [dict(zip(STAT_KEY + STAT_COUNTS, key + tuple(values))) for key, values in counts.items()]
+    dialect = engine.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        statement = upsert(TaskStat)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(STAT_KEY),
+            set_={name: getattr(TaskStat, name) + getattr(statement.excluded, name) for name in STAT_COUNTS},
+        )
+        session.execute(statement, rows)
+        return
+    for row in rows:
+        updated = session.exec(
+            update(TaskStat)
+            .where(*(getattr(TaskStat, field) == row[field] for field in STAT_KEY))
+            .values({name: getattr(TaskStat, name) + row[name] for name in STAT_COUNTS})
+        ).rowcount
+        if not updated:
+            session.add(TaskStat(**row))
+
+
+def rebuild_task_stats(user_id: Optional[int] = None) -> None:
+    """Recompute TaskStat from PlanTask rows for one user, or everyone, in one grouped query."""
+    day = func.date(Plan.created_at)
+    source = (
+        select(
+            PlanTask.user_id,
+            day,
+            PlanTask.category,
+            PlanTask.priority,
+            func.count(),
+            func.coalesce(func.sum(cast(PlanTask.done, Integer)), 0),
+            func.sum(case((PlanTask.task_type == "Deep Task", 1), else_=0)),
+            func.sum(case((PlanTask.task_type == "Micro Task", 1), else_=0)),
+        )
+        .join(Plan, Plan.id == PlanTask.plan_id)
+        .group_by(PlanTask.user_id, day, PlanTask.category, PlanTask.priority)
+    )
+    clear = delete(TaskStat)
+    if user_id is not None:
+        source = source.where(PlanTask.user_id == user_id)
+        clear = clear.where(TaskStat.user_id == user_id)
+    with get_session() as session:
+        session.exec(clear)
+        session.exec(insert(TaskStat).from_select(list(STAT_KEY + STAT_COUNTS), source))
+        session.commit()
+
+
+def _period_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+@timed("task_stats")
+def task_stats(
+    user_id: int, since: Optional[date] = None, until: Optional[date] = None, granularity: str = "week"
+) -> dict:
+    """Dashboard aggregates for a user from TaskStat buckets (no plan or task rows are read).
+
+    Returns totals by category, priority and type, the completion rate, and a timeline
+    of per-category counts per day, week or month.
+    """
+    filters = [TaskStat.user_id == user_id]
+    if since is not None:
+        filters.append(TaskStat.day >= since)
+    if until is not None:
+        filters.append(TaskStat.day <= until)
+    stats = {"total": 0, "done": 0, "by_category": {}, "by_priority": {}}
+    deep = micro = 0
+    with get_session() as session:
+        rows = session.exec(
+            select(
+                TaskStat.category,
+                TaskStat.priority,
+                func.sum(TaskStat.total),
+                func.sum(TaskStat.done),
+                func.sum(TaskStat.deep),
+                func.sum(TaskStat.micro),
+            )
+            .where(*filters)
+            .group_by(TaskStat.category, TaskStat.priority)
+        )
+        for category, priority, total, done, deep_count, micro_count in rows:
+            stats["total"] += total
+            stats["done"] += done
+            deep += deep_count
+            micro += micro_count
+            stats["by_category"][category] = stats["by_category"].get(category, 0) + total
+            stats["by_priority"][priority] = stats["by_priority"].get(priority, 0) + total
+        stats["by_type"] = {"Deep Task": deep, "Micro Task": micro, "Other": stats["total"] - deep - micro}
+        timeline = {}
+        rows = session.exec(
+            select(TaskStat.day, TaskStat.category, func.sum(TaskStat.total))
+            .where(*filters)
+            .group_by(TaskStat.day, TaskStat.category)
+        )
+        for day, category, count in rows:
+            period = timeline.setdefault(_period_start(_as_date(day), granularity), {})
+            period[category] = period.get(category, 0) + count
+    stats["completion_rate"] = stats["done"] / stats["total"] if stats["total"] else 0.0
+    stats["timeline"] = sorted(timeline.items())
+    return stats
+
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+def _job_dict(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "label": job.label,
+        "status": job.status,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def create_job(user_id: int, kind: str, payload: dict, label: str = "", audio: Optional[bytes] = None) -> int:
+    with get_session() as session:
+        job = Job(user_id=user_id, kind=kind, label=label, payload=json.dumps(payload), audio=audio)
+        session.add(job)
+        session.commit()
+        return job.id
+
+
+def claim_job(job_id: int) -> Optional[Job]:
+    """Mark a queued job running and return it; None if another worker got there first."""
+    with get_session() as session:
+        claimed = session.exec(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "queued")
+            .values(status="running", started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow())
+        ).rowcount
+        session.commit()
+        if not claimed:
+            return None
+        job = session.get(Job, job_id)
+        session.expunge(job)
+        return job
+
+
+def finish_job(job_id: int, result: Optional[dict] = None, error: str = "") -> None:
+    """Record a job's outcome and drop its audio payload."""
+    with get_session() as session:
+        session.exec(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(
+                status="failed" if error else "done",
+                result=json.dumps(result) if result is not None else "",
+                error=error,
+                audio=None,
+                finished_at=datetime.utcnow(),
+            )
+        )
+        session.commit()
+
+
+def get_job(job_id: int, user_id: Optional[int] = None) -> Optional[dict]:
+    with get_session() as session:
+        job = session.get(Job, job_id)
+        if job is None or (user_id is not None and job.user_id != user_id):
+            return None
+        return _job_dict(job)
+
+
+def list_jobs(user_id: int, limit: int = 10, statuses: Optional[tuple] = None) -> List[dict]:
+    columns = [column for column in Job.__table__.columns if column.name != "audio"]
+    statement = select(*columns).where(Job.user_id == user_id)
+    if statuses:
+        statement = statement.where(Job.status.in_(statuses))
+    statement = statement.order_by(Job.created_at.desc(), Job.id.desc()).limit(limit)
+    with get_session() as session:
+        return [_job_dict(row) for row in session.exec(statement)]
+
+
+def heartbeat_jobs(job_ids: List[int]) -> None:
+    """Mark running jobs as still alive; workers call this while they hold a job."""
+    if not job_ids:
+        return
+    with get_session() as session:
+        session.exec(
+            update(Job).where(Job.id.in_(job_ids), Job.status == "running").values(heartbeat_at=datetime.utcnow())
+        )
+        session.commit()
+
+
+def requeue_stale_jobs(older_than_seconds: float) -> List[int]:
+    """Requeue running jobs whose worker has not sent a heartbeat for `older_than_seconds`.
+
+    Returns every queued job id, oldest first.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than_seconds)
+    last_seen = func.coalesce(Job.heartbeat_at, Job.started_at)
+    with get_session() as session:
+        session.exec(
+            update(Job)
+            .where(Job.status == "running", last_seen < cutoff)
+            .values(status="queued", started_at=None, heartbeat_at=None)
+        )
+        session.commit()
+        return list(session.exec(select(Job.id).where(Job.status == "queued").order_by(Job.id)))
+
+
+@timed("get_transcription")
+def get_transcription(audio_hash: str, mime_type: str, prompt_hash: str) -> Optional[str]:
+    with get_session() as session:
+        statement = select(Transcription).where(
+            Transcription.audio_hash == audio_hash,
+            Transcription.mime_type == mime_type,
+            Transcription.prompt_hash == prompt_hash,
+        )
+        entry = session.exec(statement).first()
+        if entry is None:
+            return None
+        entry.last_used_at = datetime.utcnow()
+        session.add(entry)
+        session.commit()
+        return entry.text
+
+
+@timed("store_transcription")
+def store_transcription(
+    audio_hash: str,
+    mime_type: str,
+    prompt_hash: str,
+    text: str,
+    size_bytes: int,
+    max_entries: int = TRANSCRIPTION_CACHE_MAX_ENTRIES,
+) -> None:
+    entry = Transcription(
+        audio_hash=audio_hash,
+        mime_type=mime_type,
+        prompt_hash=prompt_hash,
+        text=text,
+        size_bytes=size_bytes,
+    )
+    with get_session() as session:
+        try:
+            session.add(entry)
+            session.commit()
+        except IntegrityError:
+            # Another session stored the same audio first; its text is just as good.
+            session.rollback()
+            return
+        count = session.exec(select(func.count()).select_from(Transcription)).one()
+        if count > max_entries:
+            stale = select(Transcription.id).order_by(Transcription.last_used_at).limit(count - max_entries)
+            session.exec(delete(Transcription).where(Transcription.id.in_(stale)))
+            session.commit()
+
+
+def invalidate_transcriptions(keep_prompt_hash: Optional[str] = None) -> int:
+    """Delete stored transcriptions, or only those made with a prompt other than `keep_prompt_hash`."""
+    with get_session() as session:
+        statement = delete(Transcription)
+        if keep_prompt_hash is not None:
+            statement = statement.where(Transcription.prompt_hash != keep_prompt_hash)
+        result = session.exec(statement)
+        session.commit()
+        return result.rowcount
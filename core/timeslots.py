@@ -0,0 +1,137 @@
+"""Pack tasks into working-hour slots over days or weeks.
+
+Each working day has a deep-work window at the start of the day and a shallow
+window after it. Deep tasks get one block each; micro tasks are grouped into
+sprints. Blocks are placed highest priority first, each into the earliest day
+whose window still has room, found with a max segment tree over per-day free
+minutes in O(log days).
+"""
+from datetime import date, datetime, time, timedelta
+
+from core.scheduling import create_focus_blocks
+
+PRIORITY_ORDER = {
+    "Urgent & Important": 0,
+    "Urgent & Not Important": 1,
+    "Important & Not Urgent": 2,
+    "Not Urgent & Not Important": 3,
+}
+DEFAULT_DURATIONS = {"Deep Task": 90, "Micro Task": 5, "Other": 30}
+WORK_START = time(9, 0)
+WORK_END = time(17, 0)
+DEEP_MINUTES_PER_DAY = 240
+CAPACITY_MINUTES_PER_DAY = 420
+WORKDAYS = (0, 1, 2, 3, 4)
+HORIZON_DAYS = 20
+
+
+class _CapacityTree:
+    """Max segment tree over per-day free minutes."""
+
+    def __init__(self, capacities):
+        size = 1
+        while size < len(capacities):
+            size *= 2
+        self.size = size
+        self.tree = [0] * (2 * size)
+        self.tree[size:size + len(capacities)] = capacities
+        for node in range(size - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def first_fit(self, minutes):
+        """Index of the earliest day with at least `minutes` free, or None."""
+        if self.tree[1] < minutes:
+            return None
+        node = 1
+        while node < self.size:
+            node = 2 * node if self.tree[2 * node] >= minutes else 2 * node + 1
+        return node - self.size
+
+    def take(self, day, minutes):
+        node = day + self.size
+        self.tree[node] -= minutes
+        node //= 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+
+def task_duration(task):
+    return int(task.get("duration") or DEFAULT_DURATIONS.get(task.get("type"), DEFAULT_DURATIONS["Other"]))
+
+
+def working_days(start, count, workdays=WORKDAYS):
+    if not set(workdays) & set(range(7)):
+        raise ValueError("workdays must include at least one weekday (0=Monday .. 6=Sunday)")
+    days = []
+    day = start
+    while len(days) < count:
+        if day.weekday() in workdays:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def _blocks(tasks):
+    """(priority rank, order, kind, tasks, minutes) per schedulable block.
+
+    Micro tasks are grouped into sprints within each priority so urgent ones are
+    not held back by sharing a sprint with low-priority ones.
+    """
+    by_rank = {}
+    for task in tasks:
+        by_rank.setdefault(PRIORITY_ORDER.get(task.get("priority"), len(PRIORITY_ORDER)), []).append(task)
+    blocks = []
+    for rank, ranked in by_rank.items():
+        for block in create_focus_blocks(ranked):
+            if block["type"] == "Other":
+                blocks.extend((rank, "Other", [task]) for task in block["tasks"])
+            else:
+                blocks.append((rank, block["type"], block["tasks"]))
+    blocks.sort(key=lambda block: block[0])
+    return [
+        (kind, block_tasks, sum(task_duration(task) for task in block_tasks))
+        for _, kind, block_tasks in blocks
+    ]
+
+
+def plan_calendar(
+    tasks,
+    start=None,
+    horizon_days=HORIZON_DAYS,
+    work_start=WORK_START,
+    work_end=WORK_END,
+    deep_minutes=DEEP_MINUTES_PER_DAY,
+    capacity_minutes=CAPACITY_MINUTES_PER_DAY,
+    workdays=WORKDAYS,
+):
+    """Return {"slots": [...], "unscheduled": [...]} for the open tasks.
+
+    Slots are dicts with start/end datetimes, the block kind and its tasks, sorted by
+    start time. Blocks that do not fit a window within `horizon_days` working days
+    are returned as unscheduled.
+    """
+    start = start or date.today()
+    day_minutes = int((datetime.combine(start, work_end) - datetime.combine(start, work_start)).total_seconds() // 60)
+    capacity = min(capacity_minutes, day_minutes)
+    deep = min(deep_minutes, capacity)
+    days = working_days(start, horizon_days, workdays)
+    windows = {
+        # kind -> (tree of free minutes, per-day next free minute, window start offset)
+        "deep": (_CapacityTree([deep] * len(days)), [0] * len(days), 0),
+        "shallow": (_CapacityTree([capacity - deep] * len(days)), [0] * len(days), deep),
+    }
+    slots = []
+    unscheduled = []
+    for kind, block_tasks, minutes in _blocks([task for task in tasks if not task.get("done")]):
+        tree, cursors, offset = windows["deep" if kind == "Deep Task" else "shallow"]
+        day = tree.first_fit(minutes)
+        if day is None:
+            unscheduled.append({"type": kind, "tasks": block_tasks, "minutes": minutes})
+            continue
+        begin = datetime.combine(days[day], work_start) + timedelta(minutes=offset + cursors[day])
+        tree.take(day, minutes)
+        cursors[day] += minutes
+        slots.append({"start": begin, "end": begin + timedelta(minutes=minutes), "type": kind, "tasks": block_tasks})
+    slots.sort(key=lambda slot: slot["start"])
+    return {"slots": slots, "unscheduled": unscheduled}
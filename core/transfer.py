@@ -0,0 +1,77 @@
+"""Move a user's saved plans between databases as NDJSON.
+
+Usage:
+    python -m core.transfer export --user-id 1 plans.ndjson
+    DB_URL=sqlite:///other.db python -m core.transfer import --user-id 7 plans.ndjson
+
+Each line holds one plan: {"title", "created_at", "transcript", "tasks": [...]}.
+Export streams plans from the database and import inserts them in batched
+transactions, so neither side holds the whole archive in memory. Use `-` for
+stdout/stdin.
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+
+from core.storage import EXPORT_BATCH_SIZE, IMPORT_BATCH_SIZE, import_plans, init_db, iter_plan_exports
+
+
+def export_plans(user_id, handle, batch_size=EXPORT_BATCH_SIZE):
+    count = 0
+    for record in iter_plan_exports(user_id, batch_size):
+        handle.write(json.dumps(record) + "\n")
+        count += 1
+    return count
+
+
+def _records(handle, errors):
+    for line_no, line in enumerate(handle, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as exc:
+            errors.append((line_no, f"invalid JSON: {exc}"))
+
+
+def _open(path, mode):
+    if path == "-":
+        # Leave the process streams open when the `with` block exits.
+        return contextlib.nullcontext(sys.stdout if "w" in mode else sys.stdin)
+    return open(path, mode, encoding="utf-8")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import a user's plans as NDJSON.")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="NDJSON file, or - for stdout/stdin")
+    parser.add_argument("--user-id", type=int, required=True, help="Owner of the exported or imported plans")
+    parser.add_argument("--batch-size", type=int, help="Plans per read batch or insert transaction")
+    args = parser.parse_args(argv)
+    init_db()
+    start = time.perf_counter()
+    if args.command == "export":
+        with _open(args.path, "w") as handle:
+            count = export_plans(args.user_id, handle, args.batch_size or EXPORT_BATCH_SIZE)
+        print(f"Exported {count} plans in {time.perf_counter() - start:.1f}s.", file=sys.stderr)
+        return 0
+    parse_errors = []
+    with _open(args.path, "r") as handle:
+        stats = import_plans(
+            args.user_id, _records(handle, parse_errors), args.batch_size or IMPORT_BATCH_SIZE, numbered=True
+        )
+    for line_no, reason in sorted(parse_errors + stats["invalid"]):
+        print(f"[skipped] line {line_no}: {reason}", file=sys.stderr)
+    skipped = len(parse_errors) + len(stats["invalid"])
+    print(
+        f"Imported {stats['imported']} plans ({skipped} skipped) in {time.perf_counter() - start:.1f}s.",
+        file=sys.stderr,
+    )
+    return 1 if skipped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
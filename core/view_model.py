@@ -0,0 +1,105 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from core.scheduling import create_focus_blocks
+from core.timeslots import plan_calendar
+
+SCHEDULE_BUCKETS = ["Today", "Tomorrow", "Later"]
+MATRIX_QUADRANTS = [
+    "Urgent & Important",
+    "Urgent & Not Important",
+    "Important & Not Urgent",
+    "Not Urgent & Not Important",
+]
+# Fields that shape the derived views; `done` is deliberately excluded so ticking a
+# checkbox keeps the same plan version.
+VIEW_FIELDS = ("task", "category", "priority", "type", "schedule", "duration")
+MAX_CACHED_VIEWS = 32
+
+
+def plan_version(tasks):
+    """SHA-256 of the fields the schedule, matrix and focus blocks depend on, stable across processes."""
+    rows = [[task.get(field) for field in VIEW_FIELDS] for task in tasks]
+    return hashlib.sha256(json.dumps(rows, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class PlanView:
+    """Schedule buckets, priority matrix and focus blocks for one plan version.
+
+    Views store task positions rather than task dicts, so a cached view can be
+    materialized against the live task list and always reflects current `done` flags.
+    """
+
+    def __init__(self, tasks):
+        self.schedule = {bucket: [] for bucket in SCHEDULE_BUCKETS}
+        self.matrix = {quadrant: [] for quadrant in MATRIX_QUADRANTS}
+        for index, task in enumerate(tasks):
+            self.schedule.setdefault(task.get("schedule", "Later"), []).append(index)
+            if task.get("priority") in self.matrix:
+                self.matrix[task["priority"]].append(index)
+        positions = {id(task): index for index, task in enumerate(tasks)}
+        self.blocks = [
+            (block["type"], [positions[id(task)] for task in block["tasks"]])
+            for block in create_focus_blocks(tasks)
+        ]
+        self._calendar = None
+
+    def schedule_tasks(self, tasks):
+        return {bucket: [tasks[i] for i in indices] for bucket, indices in self.schedule.items()}
+
+    def matrix_tasks(self, tasks):
+        return {quadrant: [tasks[i] for i in indices] for quadrant, indices in self.matrix.items()}
+
+    def focus_blocks(self, tasks):
+        return [{"type": block_type, "tasks": [tasks[i] for i in indices]} for block_type, indices in self.blocks]
+
+    def calendar(self, tasks, start=None):
+        """`plan_calendar` for the open tasks, recomputed only when `done` flags or the start day change."""
+        key = (start or date.today(), tuple(bool(task.get("done")) for task in tasks))
+        cached = self._calendar
+        if cached is None or cached[0] != key:
+            positions = {id(task): index for index, task in enumerate(tasks)}
+            result = plan_calendar(tasks, start=key[0])
+            slots = [
+                (slot["start"], slot["end"], slot["type"], [positions[id(task)] for task in slot["tasks"]])
+                for slot in result["slots"]
+            ]
+            unscheduled = [
+                (block["type"], block["minutes"], [positions[id(task)] for task in block["tasks"]])
+                for block in result["unscheduled"]
+            ]
+            cached = self._calendar = (key, slots, unscheduled)
+        _, slots, unscheduled = cached
+        return {
+            "slots": [
+                {"start": begin, "end": end, "type": kind, "tasks": [tasks[i] for i in indices]}
+                for begin, end, kind, indices in slots
+            ],
+            "unscheduled": [
+                {"type": kind, "minutes": minutes, "tasks": [tasks[i] for i in indices]}
+                for kind, minutes, indices in unscheduled
+            ],
+        }
+
+
+_views = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_plan_view(tasks):
+    """Return the cached PlanView for this plan version, building it on first use."""
+    version = plan_version(tasks)
+    with _lock:
+        view = _views.get(version)
+        if view is not None:
+            _views.move_to_end(version)
+            return view
+    view = PlanView(tasks)
+    with _lock:
+        _views[version] = view
+        while len(_views) > MAX_CACHED_VIEWS:
+            _views.popitem(last=False)
+    return view